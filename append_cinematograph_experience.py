@@ -1,8 +1,7 @@
 import os
-import time
-import ctypes
-import requests
-import webbrowser
+import sys
+import csv
+import json
 import subprocess
 
 from datetime import datetime, timedelta
@@ -10,11 +9,18 @@ from datetime import datetime, timedelta
 import config
 
 from set_logger import set_logger
-from utils_json import load_json, save_json
-
-
-class ApiError(Exception):
-    pass
+from storage import open_storage
+from kinopoisk_api import create_client
+from record_schema import compile_fields, project_record
+from refresh_scheduler import load_remaining_budget, save_spent_requests
+from title_matching import (
+    choose_candidates,
+    describe_candidate,
+    get_title_hints,
+    resolve_candidates,
+    search_candidates
+)
+from create_cinematograph_notes import run_pipeline
 
 
 def entering_date():
@@ -94,12 +100,8 @@ def input_series_data():
         logger.error("Ошибка при вводе данных сериала: %s", err)
 
 
-def add_cinematograph_experience(cinematograph_data_path, cinematograph_current_path, cinematograph_experience_path, cinematograph_type):
+def add_cinematograph_experience(storage, cinematograph_type):
     try:
-        cinematograph_data = load_json(cinematograph_data_path, {}, logger)
-        cinematograph_experience = load_json(cinematograph_experience_path, {}, logger)
-        cinematograph_current = load_json(cinematograph_current_path, {}, logger)
-
         if cinematograph_type == 'Movies':
             data = input_movie_data()
         elif cinematograph_type == 'Series':
@@ -107,15 +109,15 @@ def add_cinematograph_experience(cinematograph_data_path, cinematograph_current_
 
             # Если пользователь ставит оценку сезону — значит он закончил его просмотр,
             # можно удалить его из просматриваемых
-            if list(data.keys())[0] in list(cinematograph_current.keys()):
-                del cinematograph_current[list(data.keys())[0]]
-
-                save_json(cinematograph_current_path, cinematograph_current, logger)
+            if storage.get('current', list(data.keys())[0]) is not None:
+                storage.delete('current', list(data.keys())[0])
 
         for key, value in data.items():
+            existing_experience = storage.get('experience', key)
+
             # Проверяем, что тип Film/Series совпадает с тем, что в cinematograph_experience
-            if key in cinematograph_experience:
-                existing_data = cinematograph_data.get(cinematograph_experience[key]['kp_id'], {})
+            if existing_experience is not None:
+                existing_data = storage.get('data', existing_experience['kp_id'], {})
                 existing_is_series = existing_data.get('isSeries', None)
 
                 if existing_is_series != (cinematograph_type == 'Series'):
@@ -126,169 +128,326 @@ def add_cinematograph_experience(cinematograph_data_path, cinematograph_current_
                     user_choice = input("Вы хотите записать данные с другим типом в тот же ключ? (y/n): ")
 
                     if user_choice.lower() == 'y':
-                        cinematograph_experience[key]['experience'].append(value['experience'][0])
+                        existing_experience['experience'].append(value['experience'][0])
+                        storage.upsert('experience', key, existing_experience)
                         logger.info("Добавлено новое значение для ключа %s", key)
             else:
-                cinematograph_experience[key] = value
+                storage.upsert('experience', key, value)
                 logger.info("Добавлен новый ключ: %s", key)
 
-        save_json(cinematograph_experience_path, cinematograph_experience, logger)
+        return set(data)
     except Exception as err:
         logger.error("Ошибка при добавлении данных в JSON: %s", err)
 
+    return None
+
+
+IMPORT_SERIES_TYPES = ('series', 'сериал')
+IMPORT_MOVIE_TYPES = ('movie', 'movies', 'фильм')
+
+
+def read_import_rows(file_path):
+    """
+    Построчно читает записи импорта из CSV (с заголовком) или JSONL файла.
+
+    Строки JSONL не разбираются здесь, чтобы некорректная строка
+    пропускалась в `parse_import_row`, а не прерывала импорт.
+
+    Yields:
+        tuple: Номер строки и словарь с полями `title`, `date`, `rating`, `season`
+            и `type` (CSV) или строка JSON (JSONL).
+    """
+    with open(file_path, encoding='utf-8-sig', newline='') as file:
+        if os.path.splitext(file_path)[1].lower() == '.csv':
+            # Первая строка — заголовок
+            yield from enumerate(csv.DictReader(file), start=2)
+        else:
+            for line_number, line in enumerate(file, start=1):
+                if line.strip():
+                    yield line_number, line
+
+
+def parse_import_row(row):
+    """
+    Проверяет запись импорта.
+
+    Args:
+        row (dict | str): Строка CSV или строка JSONL.
+
+    Returns:
+        tuple: Название, признак сериала и запись просмотра.
+
+    Raises:
+        ValueError: Если запись некорректна.
+    """
+    if isinstance(row, str):
+        row = json.loads(row)
+
+    if not isinstance(row, dict):
+        raise ValueError("строка не является объектом JSON")
 
-def update_cinematograph_json(cinematograph_data_path, cinematograph_current_path, cinematograph_experience_path, title, api_key):
+    title = str(row.get('title') or '').strip()
+
+    if not title:
+        raise ValueError("не указано название")
+
+    date = datetime.strptime(str(row.get('date') or '').strip(), '%Y-%m-%d').strftime('%Y-%m-%d')
+    rating = int(row.get('rating'))
+    season = row.get('season')
+    season = int(season) if season not in (None, '') else None
+    cinematograph_type = str(row.get('type') or '').strip().lower()
+
+    if cinematograph_type in IMPORT_SERIES_TYPES:
+        is_series = True
+    elif cinematograph_type in IMPORT_MOVIE_TYPES:
+        is_series = False
+    elif not cinematograph_type:
+        is_series = season is not None
+    else:
+        raise ValueError(f"неизвестный тип {cinematograph_type}")
+
+    if is_series and season is None:
+        raise ValueError("для сериала не указан сезон")
+
+    if is_series:
+        return title, is_series, {"date": date, "season": season, "rating": rating}
+
+    return title, is_series, {"date": date, "rating": rating}
+
+
+def import_cinematograph_experience(storage, file_path):
+    """
+    Импортирует историю просмотров из CSV или JSONL файла.
+
+    Все корректные записи объединяются с `cinematograph_experience` и сохраняются
+    одной записью в хранилище. Повторно импортированные просмотры пропускаются,
+    записи с типом, отличным от уже сохраненного, пропускаются с предупреждением.
+
+    Args:
+        storage (JsonStorage | SqliteStorage): Хранилище данных.
+        file_path (str): Путь к файлу `.csv` или `.jsonl`.
+
+    Returns:
+        set | None: Измененные названия или `None` при ошибке.
+    """
     try:
-        cinematograph_experience = load_json(cinematograph_experience_path, {}, logger)
-        cinematograph_current = load_json(cinematograph_current_path, {}, logger)
-        cinematograph_data = load_json(cinematograph_data_path, {}, logger)
+        cinematograph_experience = storage.load('experience')
+        cinematograph_data = storage.load('data')
+        current_series = storage.load('current')
+        changed = {}
+        finished_series = set()
+        added = 0
+        errors = 0
+
+        for line_number, row in read_import_rows(file_path):
+            try:
+                title, is_series, experience = parse_import_row(row)
+            except (AttributeError, KeyError, TypeError, ValueError) as err:
+                errors += 1
+                logger.error("Строка %s пропущена: %s", line_number, err)
+                continue
+
+            existing_experience = changed.get(title) or cinematograph_experience.get(title)
+
+            if existing_experience is None:
+                existing_experience = {"experience": [], "kp_id": None}
+            else:
+                existing_experience = {
+                    **existing_experience,
+                    "experience": list(existing_experience['experience'])
+                }
+                existing_data = cinematograph_data.get(existing_experience.get('kp_id'), {})
+                existing_is_series = existing_data.get('isSeries')
+
+                if existing_is_series is None and existing_experience['experience']:
+                    existing_is_series = any('season' in item for item in existing_experience['experience'])
+
+                if existing_is_series is not None and existing_is_series != is_series:
+                    errors += 1
+                    logger.warning(
+                        "Строка %s пропущена: в cinematograph_experience уже есть запись для %s с другим типом.",
+                        line_number, title
+                    )
+                    continue
+
+                if experience in existing_experience['experience']:
+                    continue
+
+            existing_experience['experience'].append(experience)
+            changed[title] = existing_experience
+            added += 1
+
+            # Оценка сезона означает, что его просмотр закончен
+            if is_series and title in current_series:
+                finished_series.add(title)
+
+        if changed:
+            storage.update('experience', changed)
+
+        for title in finished_series:
+            storage.delete('current', title)
+
+        logger.info(
+            "Импортировано просмотров: %s, новых или измененных названий: %s, пропущено строк: %s",
+            added, len(changed), errors
+        )
+
+        return set(changed) | finished_series
+    except Exception as err:
+        logger.error("Ошибка при импорте из %s: %s", file_path, err)
+
+    return None
+
+
+def update_cinematograph_json(storage, title, client):
+    try:
+        current = storage.get('current', title)
+        experience_data = storage.get('experience', title)
 
         found_id = None
 
-        if title in cinematograph_current:
-            found_id = next((val['kp_id'] for key, val in cinematograph_current.items() if key.lower() == title.lower()), None)
+        if current is not None:
+            found_id = current.get('kp_id')
 
-        if not found_id and title in cinematograph_experience:
-            experience_data = cinematograph_experience[title]
+        if not found_id and experience_data is not None:
             found_id = experience_data.get('kp_id')
 
             if found_id:
-                webbrowser.open(f"https://www.kinopoisk.ru/film/{found_id}")
-                time.sleep(2)
-                user_choice = show_message_box("Подтверждение", f"Это подходящая страница для: {title}?")
+                print(f"{title}: {describe_candidate(storage.get('data', found_id, {'id': found_id}))}")
+                user_choice = input("Это подходящая запись? (y/n): ")
 
-                if user_choice != 1:
+                if user_choice.lower() != 'y':
                     found_id = None
 
         # Если ID не найдено, ищем через API
         if not found_id:
             logger.info("ID не найдено для %s, ищем название через API...", title)
-            new_data = updating_unknown_object(title, api_key)
-
-            for new_info in new_data:
-                webbrowser.open(f"https://www.kinopoisk.ru/film/{new_info['id']}")
-                time.sleep(2)
-                user_choice = show_message_box("Обновление данных", f"Это подходящая страница для: {title}?")
-
-                if user_choice == 1:
-                    found_id = str(new_info['id'])
-                    new_info['date_update'] = (datetime.now() - timedelta(days=365)).strftime('%Y-%m-%d')
-                    cinematograph_data[found_id] = new_info
-                    cinematograph_data[found_id]['title'] = title  # Сохраняем заголовок для будущих проверок
-                    save_json(cinematograph_data_path, cinematograph_data, logger)
-                    break
+            candidates, _ = search_candidates([title], client, 1, logger)
+            choices = {}
+
+            if config.matching_auto_accept_score is not None:
+                # Просматриваемые эпизоды бывают только у сериалов
+                hints = {title: get_title_hints(title, experience_data, is_series=True)}
+                choices, candidates = resolve_candidates(
+                    candidates,
+                    hints,
+                    config.matching_auto_accept_score,
+                    config.matching_min_margin
+                )
+
+            choices.update(choose_candidates(candidates, config.matching_picker, logger))
+            new_info = choices.get(title)
+
+            if new_info is not None:
+                found_id = str(new_info['id'])
+                new_info = project_record(new_info, compile_fields(config.kinopoisk_fields))
+                new_info['date_update'] = (datetime.now() - timedelta(days=365)).strftime('%Y-%m-%d')
+                new_info['title'] = title  # Сохраняем заголовок для будущих проверок
+                storage.upsert('data', found_id, new_info)
 
         if found_id:
-            if title not in cinematograph_current:
-                cinematograph_current[title] = {}
+            if current is None:
+                current = {}
 
-            past_current_season = cinematograph_current[title].get('current_season')
-            past_current_episode = cinematograph_current[title].get('current_episode')
-            past_total_episodes = cinematograph_current[title].get('total_episodes')
+            past_current_season = current.get('current_season')
+            past_current_episode = current.get('current_episode')
+            past_total_episodes = current.get('total_episodes')
 
             if past_current_season is not None:
                 user_input_current_season = input(f'Введите текущий сезон (Enter, чтобы оставить {past_current_season}): ')
-                cinematograph_current[title]['current_season'] = int(user_input_current_season) if user_input_current_season else past_current_season
+                current['current_season'] = int(user_input_current_season) if user_input_current_season else past_current_season
             else:
                 user_input_current_season = input('Введите текущий сезон: ')
-                cinematograph_current[title]['current_season'] = int(user_input_current_season)
+                current['current_season'] = int(user_input_current_season)
 
             if past_current_episode is not None:
                 user_input_current_episode = input(f'Введите текущий эпизод (Enter, чтобы оставить {past_current_episode}): ')
-                cinematograph_current[title]['current_episode'] = int(user_input_current_episode) if user_input_current_episode else past_current_episode
+                current['current_episode'] = int(user_input_current_episode) if user_input_current_episode else past_current_episode
             else:
                 user_input_current_episode = input('Введите текущий эпизод: ')
-                cinematograph_current[title]['current_episode'] = int(user_input_current_episode)
+                current['current_episode'] = int(user_input_current_episode)
 
             if past_total_episodes is not None:
                 user_input_total_episodes = input(f'Всего эпизодов в текущем сезоне (Enter, чтобы оставить {past_total_episodes}): ')
-                cinematograph_current[title]['total_episodes'] = int(user_input_total_episodes) if user_input_total_episodes else past_total_episodes
+                current['total_episodes'] = int(user_input_total_episodes) if user_input_total_episodes else past_total_episodes
             else:
                 user_input_total_episodes = input('Всего эпизодов в текущем сезоне: ')
-                cinematograph_current[title]['total_episodes'] = int(user_input_total_episodes)
+                current['total_episodes'] = int(user_input_total_episodes)
 
-            cinematograph_current[title]['kp_id'] = found_id
+            current['kp_id'] = found_id
 
-            save_json(cinematograph_current_path, cinematograph_current, logger)
+            storage.upsert('current', title, current)
         else:
             logger.error("Не удалось найти подходящие данные для %s.", title)
     except Exception as err:
         logger.error("Ошибка при обновлении JSON для %s: %s", title, err)
 
 
-def show_message_box(title, message):
-    MB_OKCANCEL = 0x1
-    return ctypes.windll.user32.MessageBoxW(None, message, title, MB_OKCANCEL)
-
-
-def updating_unknown_object(cinematograph_title, api_key):
-    try:
-        headers = {"X-API-KEY": api_key}
-        response = requests.get(
-            'https://api.kinopoisk.dev/v1.4/movie/search',
-            params={"query": cinematograph_title, "limit": 10, "page": 1},
-            headers=headers,
-            timeout=20
-        )
-
-        if response.status_code == 200:
-            movies = response.json()
-            docs = movies.get('docs', [])
-
-            return docs
-        else:
-            logger.error("API Error %s: %s", response.status_code, response.text)
-            raise ApiError(response.text)
-    except ApiError as err:
-        raise ApiError(err)
-    except Exception as err:
-        logger.error("Ошибка при поиске данных для %s: %s", cinematograph_title, err)
-
-    return []
-
-
 def main():
     try:
-        if not os.path.exists(config.json_experience_path):
-            save_json(config.json_experience_path, {}, logger)
+        storage = open_storage(logger)
 
-        if not os.path.exists(config.json_data_path):
-            save_json(config.json_data_path, {}, logger)
-
-        print('Вы добавляете:\n1. Фильм\n2. Сериал\n3. Просмотренная серия сериала\n')
+        print('Вы добавляете:\n1. Фильм\n2. Сериал\n3. Просмотренная серия сериала\n4. Историю просмотров из CSV/JSONL\n')
 
         choice = input('Выберите: ')
+        # Изменённые названия: заметки обновляются только для них и связанных с ними
+        targets = None
 
         if choice == '1':
-            add_cinematograph_experience(
-                cinematograph_data_path=config.json_data_path,
-                cinematograph_current_path=config.json_current_path,
-                cinematograph_experience_path=config.json_experience_path,
-                cinematograph_type='Movies'
-            )
+            targets = add_cinematograph_experience(storage=storage, cinematograph_type='Movies')
         elif choice == '2':
-            add_cinematograph_experience(
-                cinematograph_data_path=config.json_data_path,
-                cinematograph_current_path=config.json_current_path,
-                cinematograph_experience_path=config.json_experience_path,
-                cinematograph_type='Series'
-            )
+            targets = add_cinematograph_experience(storage=storage, cinematograph_type='Series')
         elif choice == '3':
             title = input('Введите название сериала: ')
-            update_cinematograph_json(
-                cinematograph_data_path=config.json_data_path,
-                cinematograph_current_path=config.json_current_path,
-                cinematograph_experience_path=config.json_experience_path,
-                title=title,
-                api_key=config.api_key
+            client = create_client(
+                config.api_key,
+                config.api_url,
+                pool_size=1,
+                rate_limit=config.api_rate_limit,
+                cache_path=config.api_cache_path,
+                cache_ttl=config.api_cache_ttl,
+                cache_max_size_mb=config.api_cache_max_size_mb,
+                # Поиск здесь расходует тот же дневной лимит, что и обновление данных
+                request_limit=load_remaining_budget(config.json_refresh_state_path, config.api_daily_budget, logger),
+                max_retries=config.api_max_retries,
+                backoff_base=config.api_backoff_base,
+                backoff_max=config.api_backoff_max
             )
 
-        subprocess.run(['python', 'create_cinematograph_notes.py'], shell=True, check=False)
+            try:
+                update_cinematograph_json(storage=storage, title=title, client=client)
+            finally:
+                client.log_summary(logger)
+                client.close()
+
+                if config.api_daily_budget:
+                    save_spent_requests(config.json_refresh_state_path, client.request_count, logger)
+
+            targets = {title}
+        elif choice == '4':
+            # kp_id новых названий ищутся пакетно при обновлении данных в конвейере
+            targets = import_cinematograph_experience(storage=storage, file_path=input('Путь к файлу: ').strip())
+
+        if config.in_process_pipeline:
+            run_pipeline(storage, targets)
+            storage.close()
+        else:
+            storage.close()
+            # Цели передаются через stdin: после импорта их может быть больше, чем вмещает командная строка
+            subprocess.run(
+                [sys.executable, 'create_cinematograph_notes.py', *(['-'] if targets else [])],
+                input='\n'.join(targets or ()).encode('utf-8'),
+                check=False
+            )
     except Exception as err:
         logger.error("Ошибка в функции main: %s", err)
 
 
 if __name__ == "__main__":
-    logger = set_logger(log_folder=config.log_folder, log_subfolder_name='append_cinematograph_experience')
+    logger = set_logger(
+        log_folder=config.log_folder,
+        log_subfolder_name='append_cinematograph_experience',
+        metrics_folder=config.metrics_folder
+    )
 
     main()
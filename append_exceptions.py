@@ -1,10 +1,9 @@
-import os
 import re
 
 import config
 
 from set_logger import set_logger
-from utils_json import load_json, save_json
+from storage import open_storage
 
 
 def extract_id_from_url(url):
@@ -21,9 +20,6 @@ def extract_id_from_url(url):
 
 
 def main():
-    if not os.path.exists(config.json_exceptions_path):
-        save_json(config.json_exceptions_path, [], logger)
-
     exception = None
     exceptions = []
 
@@ -40,13 +36,16 @@ def main():
             else:
                 exceptions.append(exception)
 
-    current_exceptions = load_json(config.json_exceptions_path, [], logger)
-    current_exceptions.extend(exceptions)
-
-    save_json(config.json_exceptions_path, current_exceptions, logger)
+    storage = open_storage(logger)
+    storage.update('exceptions', exceptions)
+    storage.close()
 
 
-logger = set_logger(log_folder=config.log_folder, log_subfolder_name='append_exceptions')
+logger = set_logger(
+    log_folder=config.log_folder,
+    log_subfolder_name='append_exceptions',
+    metrics_folder=config.metrics_folder
+)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
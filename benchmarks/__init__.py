@@ -0,0 +1,7 @@
+"""
+Пакет бенчмарков: генератор синтетической библиотеки, заглушка API Кинопоиска
+и сценарии замеров.
+
+Запуск из корня репозитория:
+    python -m benchmarks --sizes 1000 10000 --output results.json
+"""
\ No newline at end of file
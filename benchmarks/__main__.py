@@ -0,0 +1,146 @@
+"""
+Запуск бенчмарков: `python -m benchmarks --help`.
+"""
+import os
+import sys
+import json
+import logging
+import argparse
+import platform
+import tempfile
+
+from datetime import datetime
+
+from benchmarks import scenarios
+from benchmarks.generator import generate_library
+
+
+SCENARIOS = ('json', 'name_index', 'tables', 'franchise', 'notes', 'update', 'faults', 'api_modes', 'pagination', 'search')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Бенчмарки cinematograph')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000], help='размеры библиотеки')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.02, help='задержка ответа заглушки API, с')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1], help='процессы для заметок')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8], help='одновременные запросы к API')
+    parser.add_argument('--async-concurrency', type=int, default=64, help='одновременные запросы в режиме async')
+    parser.add_argument('--requests', type=int, default=500, help='запросов в сценарии api_modes')
+    parser.add_argument('--franchise-size', type=int, default=500, help='связанных записей в сценарии franchise')
+    parser.add_argument('--budget', type=int, default=300, help='лимит запросов к API в сценарии update')
+    parser.add_argument('--with-images', action='store_true', help='создавать кадры записей для сценария json')
+    parser.add_argument('--output', help='файл для результатов в JSON')
+
+    return parser.parse_args()
+
+
+def print_results(results):
+    print(f"{'Сценарий':<18} {'Вариант':<28} {'Размер':>8} {'Время, с':>10}")
+
+    for result in results:
+        print(f"{result['scenario']:<18} {result['variant']:<28} {result['size']:>8} {result['seconds']:>10.3f}")
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    results = []
+
+    for size in args.sizes:
+        library = generate_library(size, seed=args.seed, with_images=args.with_images)
+
+        with tempfile.TemporaryDirectory(prefix='cinematograph_bench_') as folder:
+            if 'json' in args.scenarios:
+                results.extend(scenarios.bench_json(library, folder))
+
+            if 'name_index' in args.scenarios:
+                results.extend(scenarios.bench_name_index(library))
+
+            if 'tables' in args.scenarios:
+                results.extend(scenarios.bench_tables(library))
+
+            if 'franchise' in args.scenarios:
+                results.extend(scenarios.bench_franchise(library, args.franchise_size))
+
+            if 'notes' in args.scenarios:
+                for workers in sorted(set(args.workers)):
+                    results.extend(scenarios.bench_notes(library, os.path.join(folder, f"notes_{workers}"), workers))
+
+            if 'update' in args.scenarios:
+                for concurrency in args.concurrency:
+                    results.extend(scenarios.bench_update(
+                        library,
+                        os.path.join(folder, f"update_{concurrency}"),
+                        args.latency,
+                        concurrency,
+                        args.budget
+                    ))
+
+                results.extend(scenarios.bench_update(
+                    library,
+                    os.path.join(folder, 'update_async'),
+                    args.latency,
+                    args.async_concurrency,
+                    args.budget,
+                    variant=f"async_{args.async_concurrency}",
+                    api_mode='async'
+                ))
+
+            if 'faults' in args.scenarios:
+                results.extend(scenarios.bench_faults(
+                    library,
+                    os.path.join(folder, 'faults'),
+                    args.latency,
+                    max(args.concurrency),
+                    args.budget
+                ))
+
+    if 'api_modes' in args.scenarios:
+        results.extend(scenarios.bench_api_modes(
+            args.latency,
+            args.requests,
+            max(args.concurrency),
+            args.async_concurrency
+        ))
+
+    if 'pagination' in args.scenarios:
+        results.extend(scenarios.bench_pagination(args.latency))
+
+    if 'search' in args.scenarios:
+        titles = [f"Название {index}" for index in range(100)]
+
+        for concurrency in args.concurrency:
+            results.extend(scenarios.bench_search(titles, args.latency, concurrency))
+
+    print_results(results)
+    failed = [
+        f"{result['scenario']} {result['variant']}: {name}"
+        for result in results
+        for name, passed in result.get('checks', {}).items()
+        if not passed
+    ]
+
+    for failure in failed:
+        print(f"Проверка не пройдена: {failure}")
+
+    if args.output:
+        report = {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'arguments': vars(args),
+            'results': results
+        }
+
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=4)
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,215 @@
+"""
+Генератор синтетической библиотеки в формате `cinematograph*.json`.
+"""
+import os
+import random
+
+from datetime import datetime, timedelta
+
+from utils_json import save_json
+
+
+WORDS = (
+    'Тень', 'Город', 'Ночь', 'Охота', 'Море', 'Звезда', 'Путь', 'Игра', 'Дом', 'Война',
+    'Сердце', 'Время', 'Небо', 'Остров', 'Король', 'Лес', 'Огонь', 'Зима', 'Дорога', 'Тайна'
+)
+GENRES = (
+    'драма', 'комедия', 'триллер', 'фантастика', 'боевик', 'детектив',
+    'мелодрама', 'ужасы', 'приключения', 'криминал', 'мультфильм', 'документальный'
+)
+SERIES_STATUSES = ('completed', 'ongoing', 'announced', None)
+FIRST_KP_ID = 100000
+
+
+def make_name(rnd, index, duplicate_names):
+    # Небольшая доля названий повторяется, как ремейки с тем же названием
+    if index and rnd.random() < duplicate_names:
+        index = rnd.randrange(index)
+
+    local = random.Random(index)
+
+    return f"{local.choice(WORDS)} {local.choice(WORDS).lower()} {index}"
+
+
+def make_images(rnd, kp_id, count):
+    return [
+        {
+            'movieId': kp_id,
+            'type': 'still',
+            'url': f"https://images.example/{kp_id}/{index}.jpg",
+            'previewUrl': f"https://images.example/{kp_id}/{index}_preview.jpg",
+            'height': rnd.choice((720, 1080)),
+            'width': rnd.choice((1280, 1920))
+        }
+        for index in range(count)
+    ]
+
+
+def make_record(rnd, kp_id, name, size, now, stale_fraction, external_relations):
+    is_series = rnd.random() < 0.3
+    year = rnd.randint(1950, 2024)
+    related = []
+
+    for _ in range(rnd.choice((0, 0, 1, 2, 3, 4, 6))):
+        if rnd.random() < external_relations:
+            related_id = FIRST_KP_ID + size + rnd.randrange(size)
+        else:
+            related_id = FIRST_KP_ID + rnd.randrange(size)
+
+        if related_id != kp_id:
+            related.append({
+                'id': related_id,
+                'name': f"Связанный {related_id}",
+                'alternativeName': None,
+                'year': rnd.randint(1950, 2026),
+                'type': 'tv-series' if is_series else 'movie',
+                'poster': {
+                    'url': f"https://posters.example/{related_id}.jpg",
+                    'previewUrl': f"https://posters.example/{related_id}_preview.jpg"
+                }
+            })
+
+    stale = rnd.random() < stale_fraction
+    date_update = now - timedelta(days=rnd.randint(200, 1000) if stale else rnd.randint(0, 100))
+
+    record = {
+        'id': kp_id,
+        'name': name,
+        'alternativeName': f"Title {kp_id}",
+        'enName': None,
+        'type': 'tv-series' if is_series else 'movie',
+        'year': year,
+        'description': ' '.join(rnd.choice(WORDS).lower() for _ in range(rnd.randint(40, 120))) + '.',
+        'rating': {'kp': round(rnd.uniform(4, 9), 3), 'imdb': round(rnd.uniform(4, 9), 1)},
+        'movieLength': None if is_series else rnd.randint(80, 180),
+        'genres': [{'name': genre} for genre in rnd.sample(GENRES, rnd.randint(1, 3))],
+        'poster': {
+            'url': f"https://posters.example/{kp_id}.jpg",
+            'previewUrl': f"https://posters.example/{kp_id}_preview.jpg"
+        },
+        'isSeries': is_series,
+        'sequelsAndPrequels': related,
+        'date_update': date_update.strftime('%Y-%m-%d')
+    }
+
+    if is_series:
+        seasons = rnd.randint(1, 10)
+        ended = rnd.random() < 0.6
+        record.update({
+            'status': rnd.choice(SERIES_STATUSES),
+            'seasonsInfo': [{'number': number, 'episodesCount': rnd.randint(6, 24)} for number in range(1, seasons + 1)],
+            'releaseYears': [{'start': year, 'end': year + seasons if ended else None}]
+        })
+
+    return record
+
+
+def generate_library(
+    size,
+    seed=0,
+    stale_fraction=0.2,
+    duplicate_names=0.02,
+    external_relations=0.3,
+    current_fraction=0.01,
+    exceptions_fraction=0.01,
+    max_images=150,
+    with_images=False
+):
+    """
+    Создает синтетическую библиотеку.
+
+    Args:
+        size (int): Количество названий.
+        seed (int): Зерно генератора, одинаковые параметры дают одинаковые данные.
+        stale_fraction (float): Доля записей с устаревшей `date_update`.
+        duplicate_names (float): Доля повторяющихся названий Кинопоиска.
+        external_relations (float): Доля сиквелов и приквелов вне библиотеки.
+        current_fraction (float): Доля сериалов в процессе просмотра.
+        exceptions_fraction (float): Доля kp_id в исключениях.
+        max_images (int): Максимальное количество кадров у записи.
+        with_images (bool): Создавать кадры. На 100k названий это миллионы
+            объектов, поэтому по умолчанию заполняется только `image_pages`.
+
+    Returns:
+        dict: Хранилища `experience`, `data`, `current`, `exceptions` и `images`.
+    """
+    rnd = random.Random(seed)
+    now = datetime.now()
+    experience = {}
+    data = {}
+    current = {}
+    images = {}
+
+    for index in range(size):
+        kp_id = FIRST_KP_ID + index
+        name = make_name(rnd, index, duplicate_names)
+        record = make_record(rnd, kp_id, name, size, now, stale_fraction, external_relations)
+        images_count = rnd.randint(0, max_images)
+        record['image_pages'] = max(1, -(-images_count // 50))
+
+        if with_images:
+            images[str(kp_id)] = make_images(rnd, kp_id, images_count)
+
+        viewings = []
+
+        for _ in range(rnd.choice((1, 1, 1, 2, 3))):
+            viewing = {
+                'date': (now - timedelta(days=rnd.randint(0, 3650))).strftime('%Y-%m-%d'),
+                'rating': rnd.randint(1, 10)
+            }
+
+            if record['isSeries']:
+                viewing = {
+                    'date': viewing['date'],
+                    'season': rnd.randint(1, len(record['seasonsInfo'])),
+                    'rating': viewing['rating']
+                }
+
+            viewings.append(viewing)
+
+        # Заметки называются по названию из истории, оно уникально
+        title = f"{name} ({record['year']}) #{index}"
+        experience[title] = {'experience': sorted(viewings, key=lambda item: item['date']), 'kp_id': str(kp_id)}
+        data[str(kp_id)] = record
+
+        if record['isSeries'] and rnd.random() < current_fraction * 3:
+            season = record['seasonsInfo'][-1]
+            current[title] = {
+                'current_season': season['number'],
+                'current_episode': rnd.randint(1, season['episodesCount']),
+                'total_episodes': season['episodesCount'],
+                'kp_id': str(kp_id)
+            }
+
+    exceptions = [str(FIRST_KP_ID + index) for index in rnd.sample(range(size), int(size * exceptions_fraction))]
+
+    return {'experience': experience, 'data': data, 'current': current, 'exceptions': exceptions, 'images': images}
+
+
+def write_library(folder, library, logger, compact=True):
+    """
+    Записывает библиотеку в `folder` с именами файлов по умолчанию из `config.py`.
+
+    Returns:
+        dict: Пути к файлам хранилищ (аргумент `paths` для `JsonStorage`).
+    """
+    os.makedirs(folder, exist_ok=True)
+    paths = {
+        'experience': os.path.join(folder, 'cinematograph.json'),
+        'data': os.path.join(folder, 'cinematograph_data.json'),
+        'current': os.path.join(folder, 'current_cinematograph.json'),
+        'exceptions': os.path.join(folder, 'cinematograph_exceptions.json'),
+        'relations': os.path.join(folder, 'cinematograph_relations.json')
+    }
+
+    for name in ('experience', 'data', 'current', 'exceptions'):
+        save_json(paths[name], library[name], logger, compact=compact and name == 'data')
+
+    if library['images']:
+        images_folder = os.path.join(folder, 'cinematograph_images')
+        os.makedirs(images_folder, exist_ok=True)
+
+        for kp_id, record_images in library['images'].items():
+            save_json(os.path.join(images_folder, f"{kp_id}.json"), record_images, logger, compact=True)
+
+    return paths
\ No newline at end of file
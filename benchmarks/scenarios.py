@@ -0,0 +1,544 @@
+"""
+Сценарии бенчмарков. Каждый сценарий возвращает список результатов:
+словари с полями `scenario`, `variant`, `size`, `seconds` и дополнительными
+показателями, а также замерами модуля `instrumentation`.
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+
+from storage import JsonStorage
+from utils_json import load_json, save_json
+from instrumentation import metrics
+from benchmarks.generator import write_library
+from benchmarks.stub_server import StubKinopoiskApi
+from kinopoisk_api import RateLimitError, create_async_client, create_client
+from title_matching import get_title_hints, resolve_candidates, search_candidates
+from cinematograph_data_updater import update_cinematograph_json, updating_object_images
+from create_cinematograph_notes import (
+    build_md_table,
+    get_cinematograph_title,
+    get_date_columns_and_values,
+    get_rating_columns_and_values,
+    get_sequels_and_prequels_columns_and_values,
+    update_cinematograph_notes
+)
+
+try:
+    from prettytable import PrettyTable
+except ImportError:
+    PrettyTable = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+logger = logging.getLogger()
+
+
+def measure(scenario, variant, size, function, **extra):
+    metrics.reset()
+    start = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - start
+
+    return dict(
+        {'scenario': scenario, 'variant': variant, 'size': size, 'seconds': round(seconds, 4)},
+        **extra,
+        **(result or {}),
+        metrics=metrics.to_dict()
+    )
+
+
+def open_storage_in(folder, paths):
+    return JsonStorage(
+        paths=paths,
+        logger=logger,
+        compact_names=('data', 'images', 'relations'),
+        directories={'images': os.path.join(folder, 'cinematograph_images')}
+    )
+
+
+def bench_json(library, folder):
+    """
+    Сохранение и загрузка записей, а при `--with-images` и кадров,
+    стандартным `json` и `orjson`, если он установлен.
+    С отступами данные всегда сохраняются стандартным `json`.
+    """
+    size = len(library['data'])
+    backends = [('json', json)] + ([('orjson', orjson)] if orjson else [])
+    stores = [('data', '')] + ([('images', 'images_')] if library['images'] else [])
+    results = []
+
+    for name, prefix in stores:
+        data = library[name]
+        path = os.path.join(folder, f"bench_{name}.json")
+
+        results.append(measure('json', f"{prefix}save_indent", size, lambda: save_json(path, data, logger)))
+
+        for backend_name, backend in backends:
+            results.append(measure(
+                'json',
+                f"{prefix}load_indent_{backend_name}",
+                size,
+                lambda: {'records': len(load_json(path, {}, logger, backend))}
+            ))
+
+        for backend_name, backend in backends:
+            results.append(measure(
+                'json',
+                f"{prefix}save_compact_{backend_name}",
+                size,
+                lambda: save_json(path, data, logger, compact=True, backend=backend)
+            ))
+            results.append(measure(
+                'json',
+                f"{prefix}load_compact_{backend_name}",
+                size,
+                lambda: {'records': len(load_json(path, {}, logger, backend))}
+            ))
+
+    return results
+
+
+def bench_name_index(library, sample=1000):
+    """
+    Сравнивает подсчет повторов названий полным перебором для каждой заметки
+    (как было до индекса) и индексом `Counter`. Перебор квадратичный,
+    поэтому замеряется на `sample` заметках.
+    """
+    data = library['data']
+    titles = list(library['experience'].items())[:sample]
+
+    def scan():
+        for title, value in titles:
+            record = data[value['kp_id']]
+            sum(1 for other in data.values() if other['name'] == record['name'])
+
+    def index():
+        name_counts = Counter(record.get('name') for record in data.values())
+
+        for title, value in titles:
+            get_cinematograph_title(title, data[value['kp_id']], name_counts, config.replacements_file_name)
+
+    return [
+        measure('name_index', 'scan', len(data), scan, notes=len(titles)),
+        measure('name_index', 'counter', len(data), index, notes=len(titles))
+    ]
+
+
+def build_prettytable_md_table(columns, values):
+    # Прежний путь create_md_table: таблица заполняется через PrettyTable и читается обратно
+    table = PrettyTable()
+    table.field_names = columns
+
+    for row in values:
+        table.add_row(row)
+
+    return build_md_table(table.field_names, table._rows)
+
+
+def bench_tables(library):
+    """
+    Сравнивает `build_md_table` с прежним построением через PrettyTable
+    (если пакет установлен) на таблицах дат, оценок и сиквелов всех заметок.
+    """
+    data = library['data']
+    all_ids = frozenset(data)
+    exceptions = frozenset(str(kp_id) for kp_id in library['exceptions'])
+    tables = []
+
+    for value in library['experience'].values():
+        record = data[value['kp_id']]
+        info = {'sequels_and_prequels_titles': [], 'sequels_and_prequels_links': [], 'sequels_and_prequels': False}
+        tables.extend([
+            get_date_columns_and_values(value['experience'], record),
+            get_rating_columns_and_values(value['experience'], record),
+            get_sequels_and_prequels_columns_and_values(
+                all_ids,
+                dict(record, sequelsAndPrequels=[dict(item) for item in record['sequelsAndPrequels']]),
+                info,
+                exceptions,
+                config.replacements_file_name
+            )
+        ])
+
+    tables = [(columns, values) for columns, values in tables if columns and values]
+
+    def build(builder):
+        return lambda: {'tables': len([builder(columns, values) for columns, values in tables])}
+
+    results = [measure('markdown_tables', 'build_md_table', len(data), build(build_md_table))]
+
+    if PrettyTable is not None:
+        result = measure('markdown_tables', 'prettytable', len(data), build(build_prettytable_md_table))
+        same_output = all(
+            build_md_table(columns, values) == build_prettytable_md_table(columns, values)
+            for columns, values in tables
+        )
+        results.append(add_checks(result, same_output=same_output))
+
+    return results
+
+
+def bench_franchise(library, franchise_size=500, repeats=20):
+    """
+    Разбор сиквелов и приквелов франшизы из `franchise_size` связанных записей.
+    Половина из них есть в библиотеке, часть в исключениях. Время не должно
+    зависеть от размера библиотеки.
+    """
+    size = len(library['data'])
+    kp_ids = list(library['data'])
+    all_ids = frozenset(kp_ids)
+    exceptions = frozenset(str(kp_id) for kp_id in library['exceptions'])
+    related = [
+        {
+            'id': int(kp_ids[index % size]) if index % 2 == 0 else 10 ** 9 + index,
+            'name': f"Часть {index}",
+            'year': 1950 + index % 70,
+            'poster': {'url': f"https://posters.example/franchise/{index}.jpg"}
+        }
+        for index in range(franchise_size)
+    ]
+
+    def resolve():
+        for _ in range(repeats):
+            info = {'sequels_and_prequels_titles': [], 'sequels_and_prequels_links': [], 'sequels_and_prequels': False}
+            data = {'sequelsAndPrequels': [dict(item) for item in related]}
+            _, values = get_sequels_and_prequels_columns_and_values(
+                all_ids,
+                data,
+                info,
+                exceptions,
+                config.replacements_file_name
+            )
+
+        return {'rows': len(values), 'unwatched': len(info['sequels_and_prequels_titles'])}
+
+    return [measure('franchise', f"related_{franchise_size}", size, resolve, repeats=repeats)]
+
+
+def bench_notes(library, folder, workers):
+    size = len(library['data'])
+    paths = write_library(folder, library, logger)
+    notes_folder = os.path.join(folder, 'notes')
+    results = []
+
+    def render(targets=None):
+        storage = open_storage_in(folder, paths)
+        update_cinematograph_notes(
+            notes_folder,
+            config.replacements_file_name,
+            config.replacements_file_content,
+            storage,
+            notes_manifest_file_name=config.notes_manifest_file_name,
+            notes_workers=workers,
+            targets=targets,
+            unwatched_report_file_name=config.unwatched_report_file_name,
+            stats_file_name=config.stats_file_name
+        )
+
+        return {'counters': metrics.to_dict()['counters']}
+
+    target = next(iter(library['experience']))
+
+    results.append(measure('notes', 'cold', size, render, workers=workers))
+    results.append(measure('notes', 'warm_manifest', size, render, workers=workers))
+    results.append(measure('notes', 'targeted_one_title', size, lambda: render({target}), workers=workers))
+
+    return results
+
+
+def bench_update(library, folder, latency, concurrency, budget, variant=None, api_mode='sync', **faults):
+    """
+    Обновляет устаревшие записи через заглушку API. Количество запросов
+    ограничивается дневным лимитом `budget`, чтобы время не росло с размером библиотеки.
+
+    Args:
+        variant (str, optional): Название варианта, по умолчанию `concurrency_N`.
+        api_mode (str): `sync` или `async`. В режиме `async` `concurrency`
+            ограничивает количество одновременных запросов.
+        **faults: Параметры ошибок `StubKinopoiskApi`: `rate_limit_errors`,
+            `server_errors`, `retry_after`, `quota`.
+    """
+    size = len(library['data'])
+    paths = write_library(folder, library, logger)
+    api = StubKinopoiskApi(movies=library['data'], latency=latency, **faults)
+    url = api.start()
+    queue_path = os.path.join(folder, 'queue.json')
+
+    for file_name in ('queue.json', 'refresh_state.json'):
+        if os.path.exists(os.path.join(folder, file_name)):
+            os.remove(os.path.join(folder, file_name))
+
+    def update():
+        updated = update_cinematograph_json(
+            storage=open_storage_in(folder, paths),
+            update_threshold=config.update_threshold,
+            api_key='benchmark',
+            api_url=url,
+            api_concurrency=concurrency,
+            api_image_concurrency=config.api_image_concurrency,
+            api_rate_limit=None,
+            api_cache_path=None,
+            api_cache_ttl=0,
+            api_cache_max_size_mb=0,
+            json_queue_path=queue_path,
+            checkpoint_every_titles=config.checkpoint_every_titles,
+            checkpoint_every_seconds=config.checkpoint_every_seconds,
+            api_daily_budget=budget,
+            json_refresh_state_path=os.path.join(folder, 'refresh_state.json'),
+            matching_picker=config.matching_picker,
+            matching_auto_accept_score=config.matching_auto_accept_score,
+            matching_min_margin=config.matching_min_margin,
+            api_max_retries=config.api_max_retries,
+            api_backoff_base=config.api_backoff_base,
+            api_backoff_max=config.api_backoff_max,
+            kinopoisk_fields=config.kinopoisk_fields,
+            api_mode=api_mode,
+            api_async_concurrency=concurrency
+        )
+
+        return {
+            'requests': api.total_requests,
+            'changed': len(updated or ()),
+            'retries': metrics.to_dict()['counters'].get('api.retries', 0),
+            'queued': len(load_json(queue_path, {}, logger))
+        }
+
+    try:
+        return [measure(
+            'update',
+            variant or f"concurrency_{concurrency}",
+            size,
+            update,
+            latency=latency,
+            budget=budget,
+            concurrency=concurrency,
+            api_mode=api_mode,
+            **faults
+        )]
+    finally:
+        api.stop()
+
+
+def add_checks(result, **checks):
+    """
+    Добавляет к результату проверки сценария. Непройденные проверки
+    выводятся после таблицы, и запуск завершается с кодом 1.
+    """
+    result.setdefault('checks', {}).update({name: bool(passed) for name, passed in checks.items()})
+
+    return result
+
+
+def bench_faults(library, folder, latency, concurrency, budget):
+    """
+    Обновление при ошибках API:
+
+    - 429 и 502 повторяются, и обновляются все устаревшие записи;
+    - 429 с `Retry-After` больше `api_backoff_max` не повторяется;
+    - исчерпание лимита (403) останавливает все потоки и задачи, необработанные
+      записи остаются в очереди.
+    """
+    results = []
+
+    for api_mode in ('sync', 'async'):
+        # Без дневного лимита все устаревшие записи должны обновиться, несмотря на ошибки
+        result, = bench_update(
+            library,
+            os.path.join(folder, f"rate_limited_{api_mode}"),
+            latency,
+            concurrency,
+            None,
+            variant=f"rate_limited_{api_mode}",
+            api_mode=api_mode,
+            rate_limit_errors=0.05,
+            server_errors=0.05,
+            retry_after='0.1'
+        )
+        results.append(add_checks(
+            result,
+            retried=result['retries'] > 0,
+            refresh_completed=result['queued'] == 0 and result['changed'] > 0
+        ))
+
+        quota = budget // 3
+        result, = bench_update(
+            library,
+            os.path.join(folder, f"quota_{api_mode}"),
+            latency,
+            concurrency,
+            budget,
+            variant=f"quota_exhausted_{api_mode}",
+            api_mode=api_mode,
+            quota=quota
+        )
+        # После первого 403 завершаются только запросы, уже отправленные другими потоками
+        in_flight = concurrency * (config.api_image_concurrency if api_mode == 'sync' else 1)
+        results.append(add_checks(
+            result,
+            stopped=result['requests'] <= quota + in_flight,
+            queue_kept=result['queued'] > 0
+        ))
+
+    results.append(check_long_retry_after(latency))
+
+    return results
+
+
+def check_long_retry_after(latency):
+    api = StubKinopoiskApi(latency=latency, rate_limit_errors=1.0, retry_after=str(config.api_backoff_max * 10))
+    url = api.start()
+    client = create_client(
+        'benchmark',
+        url,
+        pool_size=1,
+        rate_limit=None,
+        max_retries=config.api_max_retries,
+        backoff_base=config.api_backoff_base,
+        backoff_max=config.api_backoff_max
+    )
+
+    def request():
+        try:
+            client.get('/v1.4/movie/1')
+        except RateLimitError:
+            return {'requests': api.total_requests, 'raised': True}
+
+        return {'requests': api.total_requests, 'raised': False}
+
+    try:
+        result = measure('faults', 'long_retry_after', 1, request, latency=latency)
+    finally:
+        client.close()
+        api.stop()
+
+    return add_checks(result, not_retried=result['raised'] and result['requests'] == 1)
+
+
+def bench_api_modes(latency, requests_count, concurrency, async_concurrency):
+    """
+    Пропускная способность клиента API на `requests_count` запросах
+    `/v1.4/movie/{id}`: последовательно, потоками и асинхронно.
+    """
+    api = StubKinopoiskApi(latency=latency)
+    url = api.start()
+    paths = [f'/v1.4/movie/{kp_id}' for kp_id in range(1, requests_count + 1)]
+    results = []
+
+    def report(seconds_start):
+        return {'requests_per_second': round(requests_count / (time.perf_counter() - seconds_start), 1)}
+
+    def sync():
+        start = time.perf_counter()
+        client = create_client('benchmark', url, pool_size=1, rate_limit=None)
+
+        for path in paths:
+            client.get(path).json()
+
+        client.close()
+
+        return report(start)
+
+    def threaded(workers):
+        start = time.perf_counter()
+        client = create_client('benchmark', url, pool_size=workers, rate_limit=None)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(lambda path: client.get(path).json(), paths))
+
+        client.close()
+
+        return report(start)
+
+    async def gather():
+        client = create_async_client('benchmark', url, concurrency=async_concurrency, rate_limit=None)
+
+        async def get(path):
+            return (await client.get(path)).json()
+
+        try:
+            await asyncio.gather(*(get(path) for path in paths))
+        finally:
+            await client.aclose()
+
+    def async_mode():
+        start = time.perf_counter()
+        asyncio.run(gather())
+
+        return report(start)
+
+    try:
+        results.append(measure('api_modes', 'sync', requests_count, sync, latency=latency))
+
+        # Потоки сравниваются и с тем же количеством одновременных запросов, что у async
+        for workers in sorted({concurrency, async_concurrency}):
+            results.append(measure(
+                'api_modes',
+                f"threads_{workers}",
+                requests_count,
+                lambda: threaded(workers),
+                latency=latency
+            ))
+
+        results.append(measure('api_modes', f"async_{async_concurrency}", requests_count, async_mode, latency=latency))
+    finally:
+        api.stop()
+
+    return results
+
+
+def bench_pagination(latency, pages=10):
+    api = StubKinopoiskApi(latency=latency, images_per_movie=pages * 50)
+    url = api.start()
+    results = []
+
+    try:
+        for concurrency in (1, config.api_image_concurrency):
+            client = create_client('benchmark', url, pool_size=concurrency, rate_limit=None)
+
+            def fetch():
+                images = updating_object_images({}, client, 1, concurrency)
+
+                return {'images': len(images or ())}
+
+            results.append(measure('image_pagination', f"concurrency_{concurrency}", pages, fetch, latency=latency))
+            client.close()
+    finally:
+        api.stop()
+
+    return results
+
+
+def bench_search(titles, latency, concurrency):
+    api = StubKinopoiskApi(latency=latency)
+    url = api.start()
+    client = create_client('benchmark', url, pool_size=concurrency, rate_limit=None)
+
+    def search():
+        candidates, _ = search_candidates(titles, client, concurrency, logger)
+        hints = {title: get_title_hints(title) for title in candidates}
+        accepted, ambiguous = resolve_candidates(
+            candidates,
+            hints,
+            config.matching_auto_accept_score,
+            config.matching_min_margin
+        )
+
+        return {'accepted': len(accepted), 'ambiguous': len(ambiguous)}
+
+    try:
+        return [measure('search', f"concurrency_{concurrency}", len(titles), search, latency=latency)]
+    finally:
+        client.close()
+        api.stop()
\ No newline at end of file
@@ -0,0 +1,168 @@
+"""
+Локальная заглушка API Кинопоиска для бенчмарков.
+
+Поддерживаются `/v1.4/movie/{id}`, `/v1.4/movie/search` и `/v1.4/image`
+с настраиваемой задержкой, ошибками 429 и 502 и исчерпанием лимита (403).
+"""
+import re
+import json
+import time
+import random
+import threading
+
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+IMAGES_PAGE_SIZE = 50
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Очередь соединений по умолчанию (5) переполняется при сотнях одновременных запросов
+    request_queue_size = 1024
+
+
+class StubKinopoiskApi:
+    """
+    Args:
+        movies (dict, optional): Записи по kp_id для ответов `/v1.4/movie/{id}`.
+            Для остальных kp_id запись создается на лету.
+        latency (float): Задержка каждого ответа в секундах.
+        images_per_movie (int): Количество кадров у записи без `image_pages`.
+        rate_limit_errors (float): Доля ответов 429 с заголовком `Retry-After`.
+        server_errors (float): Доля ответов 502.
+        retry_after (str): Значение заголовка `Retry-After` в ответах 429.
+        quota (int, optional): Количество запросов, после которого все ответы 403.
+        seed (int): Зерно генератора ошибок.
+    """
+    def __init__(self, movies=None, latency=0.0, images_per_movie=100, rate_limit_errors=0.0, server_errors=0.0, retry_after='1', quota=None, seed=0):
+        self.movies = movies or {}
+        self.latency = latency
+        self.images_per_movie = images_per_movie
+        self.rate_limit_errors = rate_limit_errors
+        self.server_errors = server_errors
+        self.retry_after = retry_after
+        self.quota = quota
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.server = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    @property
+    def total_requests(self):
+        with self.lock:
+            return sum(self.requests.values())
+
+    def start(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Заголовки и тело отправляются отдельно, без этого keep-alive упирается в задержку ACK
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                status, body, headers = api.handle(self.path, self.headers)
+                payload = json.dumps(body, ensure_ascii=False).encode('utf-8') if body is not None else b''
+
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+
+                for key, value in headers.items():
+                    self.send_header(key, value)
+
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self.server = StubServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        return self.url
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def movie(self, kp_id):
+        return self.movies.get(str(kp_id)) or {
+            'id': kp_id,
+            'name': f"Фильм {kp_id}",
+            'alternativeName': f"Movie {kp_id}",
+            'year': 2000 + kp_id % 25,
+            'isSeries': kp_id % 3 == 0,
+            'genres': [{'name': 'драма'}],
+            'rating': {'kp': 7.0, 'imdb': 7.0},
+            'poster': {'url': f"https://posters.example/{kp_id}.jpg", 'previewUrl': None},
+            'description': 'Описание',
+            'sequelsAndPrequels': []
+        }
+
+    def handle(self, path, headers):
+        url = urlparse(path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        endpoint = re.sub(r'/\d+$', '/{id}', url.path)
+
+        with self.lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            number = sum(self.requests.values())
+            fault = self.random.random()
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if self.quota is not None and number > self.quota:
+            return 403, {'message': 'Вы израсходовали ваш суточный лимит по запросам'}, {}
+
+        if fault < self.rate_limit_errors:
+            return 429, {'message': 'Too Many Requests'}, {'Retry-After': self.retry_after}
+
+        if fault < self.rate_limit_errors + self.server_errors:
+            return 502, {'message': 'Bad Gateway'}, {}
+
+        match = re.fullmatch(r'/v1\.4/movie/(\d+)', url.path)
+
+        if match:
+            movie = self.movie(int(match.group(1)))
+            etag = f'"{movie["id"]}-{movie.get("date_update", "")}"'
+
+            if headers.get('If-None-Match') == etag:
+                return 304, None, {'ETag': etag}
+
+            return 200, {key: value for key, value in movie.items() if key not in ('date_update', 'image_pages')}, {'ETag': etag}
+
+        if url.path == '/v1.4/movie/search':
+            query = params.get('query', '')
+            limit = int(params.get('limit', 10))
+            seed = sum(query.encode('utf-8'))
+            docs = [
+                dict(self.movie(seed * 10 + index), name=query if index == 0 else f"{query} {index}")
+                for index in range(limit)
+            ]
+
+            return 200, {'docs': docs, 'total': limit, 'limit': limit, 'page': 1, 'pages': 1}, {}
+
+        if url.path == '/v1.4/image':
+            kp_id = int(params.get('movieId', 0))
+            page = int(params.get('page', 1))
+            limit = int(params.get('limit', IMAGES_PAGE_SIZE))
+            movie = self.movies.get(str(kp_id)) or {}
+            total = movie.get('image_pages', 0) * limit or self.images_per_movie
+            pages = max(1, -(-total // limit))
+            docs = [
+                {'movieId': kp_id, 'type': 'still', 'url': f"https://images.example/{kp_id}/{index}.jpg"}
+                for index in range((page - 1) * limit, min(page * limit, total))
+            ]
+
+            return 200, {'docs': docs, 'total': total, 'limit': limit, 'page': page, 'pages': pages}, {}
+
+        return 404, {'message': 'Not found'}, {}
\ No newline at end of file
@@ -1,194 +1,671 @@
 import os
+import sys
 import time
-import ctypes
-import requests
-import webbrowser
+import asyncio
+import logging
+import threading
 
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import config
 
 from set_logger import set_logger
+from storage import open_storage
 from utils_json import load_json, save_json
+from kinopoisk_api import ApiError, NotFoundError, QuotaExceededError, create_async_client, create_client
+from title_matching import (
+    choose_candidates,
+    get_title_hints,
+    resolve_candidates,
+    search_candidates,
+    search_candidates_async
+)
+from instrumentation import count, timed
+from record_schema import compile_fields, project_record
+from relation_index import update_relation_index
+from refresh_scheduler import is_not_found_since, load_remaining_budget, save_spent_requests, select_refresh_candidates
 
 
-class ApiError(Exception):
-    pass
+# Поля кадров обновляются только после успешной загрузки всех страниц
+IMAGE_FIELDS = ('date_image_update', 'image_pages')
 
 
-def updating_unknown_object(cinematograph_title, api_key):
+def read_known_object(response, fields, old_cinematograph_data):
+    if response.status_code != 200:
+        logger.error("API Error %s: %s", response.status_code, response.text)
+
+        raise ApiError(response.text)
+
+    current_cinematograph_data = project_record(response.json(), fields)
+    current_cinematograph_data['date_update'] = datetime.now().strftime('%Y-%m-%d')
+
+    # Ответ API не содержит локальных полей кадров: переносим их из прежней записи,
+    # чтобы они сохранились, если загрузить кадры не удастся
+    current_cinematograph_data.update({
+        field: old_cinematograph_data[field]
+        for field in IMAGE_FIELDS
+        if field in old_cinematograph_data
+    })
+
+    return current_cinematograph_data
+
+
+def updating_known_object(old_cinematograph_data, client, kp_id, fields=None):
     try:
-        headers = {"X-API-KEY": api_key}
-        response = requests.get(
-            'https://api.kinopoisk.dev/v1.4/movie/search',
-            params={"query": cinematograph_title, "limit": 10, "page": 1},
-            headers=headers,
-            timeout=20
-        )
-
-        if response.status_code == 200:
-            movies = response.json()
-            docs = movies.get('docs', [])
-
-            return docs
-        else:
-            logger.error("API Error %s: %s", response.status_code, response.text)
-            raise ApiError(response.text)
-    except ApiError as err:
-        raise ApiError(err)
+        return read_known_object(client.get(f'/v1.4/movie/{kp_id}'), fields, old_cinematograph_data)
+    except ApiError:
+        raise
     except Exception as err:
-        logger.error("Ошибка при поиске данных для %s: %s", cinematograph_title, err)
+        logger.error("Ошибка при обновлении данных для %s: %s", kp_id, err)
 
-    return []
+    return old_cinematograph_data
 
 
-def updating_known_object(old_cinematograph_data, api_key, kp_id):
+async def updating_known_object_async(old_cinematograph_data, client, kp_id, fields=None):
     try:
-        headers = {"X-API-KEY": api_key}
-        response = requests.get(
-            f'https://api.kinopoisk.dev/v1.4/movie/{kp_id}',
-            headers=headers,
-            timeout=20
-        )
-
-        if response.status_code == 200:
-            current_cinematograph_data = response.json()
-            current_cinematograph_data['date_update'] = datetime.now().strftime('%Y-%m-%d')
-
-            return current_cinematograph_data
-        else:
-            logger.error("API Error %s: %s", response.status_code, response.text)
-
-            raise ApiError(response.text)
-    except ApiError as err:
-        raise ApiError(err)
+        return read_known_object(await client.get(f'/v1.4/movie/{kp_id}'), fields, old_cinematograph_data)
+    except ApiError:
+        raise
     except Exception as err:
         logger.error("Ошибка при обновлении данных для %s: %s", kp_id, err)
 
     return old_cinematograph_data
 
 
-def updating_object_images(cinematograph_data, api_key, kp_id):
+def get_images_params(kp_id, page):
+    return {'movieId': kp_id, 'page': page, 'limit': 50, 'type': 'still'}
+
+
+def read_images_page(response):
+    if response.status_code == 200:
+        return response.json()
+
+    raise ApiError(f"API Error {response.status_code}: {response.text}")
+
+
+def fetching_images_page(client, kp_id, page):
+    # Повторы при 429 и временных ошибках выполняет клиент
+    return read_images_page(client.get('/v1.4/image', params=get_images_params(kp_id, page)))
+
+
+async def fetching_images_page_async(client, kp_id, page):
+    return read_images_page(await client.get('/v1.4/image', params=get_images_params(kp_id, page)))
+
+
+def collect_images(cinematograph_data, pages):
+    cinematograph_data['date_image_update'] = datetime.now().strftime('%Y-%m-%d')
+    # Количество страниц учитывается планировщиком при оценке стоимости обновления
+    cinematograph_data['image_pages'] = len(pages)
+
+    return [image for page in pages for image in page.get('docs', [])]
+
+
+def updating_object_images(cinematograph_data, client, kp_id, concurrency=1):
+    """
+    Загружает кадры записи. Изображения хранятся отдельно от `cinematograph_data`,
+    в записи обновляются только `date_image_update` и `image_pages`.
+
+    Частично загруженный набор не сохраняется: если не удалась хотя бы одна
+    страница, прежние изображения и `date_image_update` остаются без изменений.
+
+    Returns:
+        list | None: Список изображений или `None`, если загрузить их не удалось.
+
+    Raises:
+        QuotaExceededError: Лимит запросов исчерпан.
+    """
     try:
-        headers = {"X-API-KEY": api_key}
-        all_images = []
-        page = 1
-
-        while True:
-            response = requests.get(
-                'https://api.kinopoisk.dev/v1.4/image',
-                headers=headers,
-                params={'movieId': kp_id, 'page': page, 'limit': 50, 'type': 'still'},
-                timeout=20
-            )
+        first_page = fetching_images_page(client, kp_id, 1)
+
+        pages = [first_page]
+        other_pages = range(2, first_page.get('pages', 0) + 1)
 
-            if response.status_code != 200:
-                logger.error("API Error %s: %s", response.status_code, response.text)
-                break
+        if other_pages:
+            with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+                # executor.map возвращает результаты в порядке страниц
+                pages.extend(executor.map(
+                    lambda page: fetching_images_page(client, kp_id, page),
+                    other_pages
+                ))
 
-            data = response.json()
-            all_images.extend(data.get('docs', []))
+        return collect_images(cinematograph_data, pages)
+
+    except QuotaExceededError:
+        raise
+    except ApiError as err:
+        logger.error("Не удалось загрузить все изображения для %s, оставляем прежние данные: %s", kp_id, err)
+    except Exception as err:
+        logger.error("Ошибка при обновлении изображений для %s: %s", kp_id, err)
 
-            if page >= data.get('pages', 0):
-                break
+    return None
 
-            page += 1
 
-        cinematograph_data['images'] = all_images
-        cinematograph_data['date_image_update'] = datetime.now().strftime('%Y-%m-%d')
+async def updating_object_images_async(cinematograph_data, client, kp_id):
+    """
+    Асинхронный вариант `updating_object_images`: все страницы после
+    первой запрашиваются одновременно.
+    """
+    try:
+        first_page = await fetching_images_page_async(client, kp_id, 1)
+        other_pages = await asyncio.gather(*(
+            fetching_images_page_async(client, kp_id, page)
+            for page in range(2, first_page.get('pages', 0) + 1)
+        ))
 
-        return cinematograph_data
+        return collect_images(cinematograph_data, [first_page, *other_pages])
 
+    except QuotaExceededError:
+        raise
+    except ApiError as err:
+        logger.error("Не удалось загрузить все изображения для %s, оставляем прежние данные: %s", kp_id, err)
     except Exception as err:
         logger.error("Ошибка при обновлении изображений для %s: %s", kp_id, err)
 
-    return cinematograph_data
+    return None
+
+
+def moving_images_to_side_store(cinematograph_data, storage):
+    images = {
+        kp_id: data.pop('images')
+        for kp_id, data in cinematograph_data.items()
+        if 'images' in data
+    }
+
+    if images:
+        storage.update('images', images)
+        logger.info("Изображения перенесены в отдельное хранилище: %s записей", len(images))
+
+    return list(images)
+
+
+class Checkpoint:
+    """
+    Периодически сохраняет промежуточный результат обновления.
+
+    Сохранение выполняется каждые `every_titles` изменений или
+    каждые `every_seconds` секунд, смотря что наступит раньше.
+    """
+    def __init__(self, save_callback, every_titles, every_seconds):
+        self.save_callback = save_callback
+        self.every_titles = every_titles
+        self.every_seconds = every_seconds
+        self.changes = 0
+        self.changed = {'data': set(), 'experience': set()}
+        self.last_save_time = time.monotonic()
+
+    def step(self, name, key):
+        self.changes += 1
+        self.changed[name].add(key)
+
+        titles_reached = self.every_titles and self.changes >= self.every_titles
+        seconds_reached = self.every_seconds and time.monotonic() - self.last_save_time >= self.every_seconds
+
+        if titles_reached or seconds_reached:
+            self.flush()
+
+    def flush(self):
+        self.save_callback(self.changed)
+        self.changes = 0
+        self.changed = {'data': set(), 'experience': set()}
+        self.last_save_time = time.monotonic()
+
+
+def refresh_object(data, client, kp_id, image_concurrency, api_stop, fields):
+    if api_stop.is_set():
+        return None, None
+
+    # Работаем с копией, чтобы контрольная точка не сериализовала запись во время изменения
+    data = dict(data)
+    data = updating_known_object(data, client, kp_id, fields)
+    images = updating_object_images(data, client, kp_id, image_concurrency)
+
+    return data, images
 
 
-def show_message_box(title, message):
-    MB_OKCANCEL = 0x1
-    return ctypes.windll.user32.MessageBoxW(None, message, title, MB_OKCANCEL)
+async def refresh_object_async(data, client, kp_id, api_stop, fields):
+    if api_stop.is_set():
+        return None, None
 
+    data = dict(data)
+    data = await updating_known_object_async(data, client, kp_id, fields)
+    images = await updating_object_images_async(data, client, kp_id)
 
-def update_cinematograph_json(json_data_path, json_experience_path, update_threshold, api_key):
+    return data, images
+
+
+def apply_refresh_result(storage, cinematograph_data, pending_objects, checkpoint, api_stop, title, kp_id, future):
+    """
+    Сохраняет результат `refresh_object` или `refresh_object_async` из
+    завершившейся задачи `future` и обрабатывает ошибки API.
+    """
+    try:
+        data, images = future.result()
+
+        if images is not None:
+            storage.upsert('images', kp_id, images)
+
+        if data is not None:
+            cinematograph_data[kp_id] = data
+            pending_objects.pop(kp_id, None)
+            checkpoint.step('data', kp_id)
+            count('update.refreshed')
+    except QuotaExceededError:
+        api_stop.set()
+    except NotFoundError as err:
+        # Дата сохраняется в записи, чтобы не запрашивать ее снова до истечения срока актуальности
+        cinematograph_data[kp_id]['date_not_found'] = datetime.now().strftime('%Y-%m-%d')
+        pending_objects.pop(kp_id, None)
+        checkpoint.step('data', kp_id)
+        logger.error("Запись %s (%s) не найдена на Кинопоиске: %s", title, kp_id, err)
+    except ApiError as err:
+        logger.error("Ошибка API при обновлении данных для %s, повторим при следующем запуске: %s", title, err)
+    except Exception as err:
+        pending_objects.pop(kp_id, None)
+        logger.error("Ошибка при обновлении данных для %s: %s", title, err)
+
+
+def refresh_stale_objects(
+    storage,
+    cinematograph_data,
+    stale_objects,
+    client,
+    concurrency,
+    image_concurrency,
+    pending_objects,
+    checkpoint,
+    fields=None
+):
+    """
+    Параллельно обновляет устаревшие записи `cinematograph_data`.
+
+    При исчерпании лимита (`QuotaExceededError`) новые запросы к API больше
+    не отправляются, уже обновленные записи сохраняются. Записи с временными
+    ошибками остаются в очереди до следующего запуска, не найденные удаляются из нее
+    с отметкой `date_not_found` в записи.
+
+    Args:
+        storage (JsonStorage | SqliteStorage): Хранилище для сохранения изображений.
+        cinematograph_data (dict): Данные Кинопоиска по kp_id.
+        stale_objects (list): Пары `(title, kp_id)` для обновления.
+        client (KinopoiskClient): Клиент API.
+        concurrency (int): Количество потоков.
+        image_concurrency (int): Количество потоков для загрузки страниц изображений одной записи.
+        pending_objects (dict): Очередь необработанных записей `kp_id -> title`,
+            из нее удаляются обработанные записи.
+        checkpoint (Checkpoint): Контрольная точка для промежуточного сохранения.
+        fields (dict, optional): Дерево сохраняемых полей из `compile_fields`.
+
+    Returns:
+        bool: `False`, если API стал недоступен.
+    """
+    api_stop = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency))
+
+    try:
+        futures = {
+            executor.submit(
+                refresh_object,
+                cinematograph_data[kp_id],
+                client,
+                kp_id,
+                image_concurrency,
+                api_stop,
+                fields
+            ): (title, kp_id)
+            for title, kp_id in stale_objects
+        }
+
+        for future in as_completed(futures):
+            title, kp_id = futures[future]
+            apply_refresh_result(storage, cinematograph_data, pending_objects, checkpoint, api_stop, title, kp_id, future)
+    finally:
+        # При прерывании (Ctrl+C) не ждем оставшиеся задачи
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return not api_stop.is_set()
+
+
+async def refresh_stale_objects_async(
+    storage,
+    cinematograph_data,
+    stale_objects,
+    client,
+    pending_objects,
+    checkpoint,
+    fields=None
+):
+    """
+    Асинхронный вариант `refresh_stale_objects`: задача создается сразу для
+    каждой записи, количество одновременных запросов ограничивает
+    `AsyncKinopoiskClient`. Результаты сохраняются по мере завершения задач.
+
+    Одновременно обновляется не больше `client.concurrency` записей, чтобы
+    начатые записи завершались раньше, чем начинаются новые, и при исчерпании
+    лимита не оставалось много наполовину обновленных записей.
+
+    Returns:
+        bool: `False`, если API стал недоступен.
+    """
+    api_stop = threading.Event()
+    records_semaphore = asyncio.Semaphore(client.concurrency)
+
+    async def refresh(kp_id):
+        async with records_semaphore:
+            return await refresh_object_async(cinematograph_data[kp_id], client, kp_id, api_stop, fields)
+
+    tasks = {asyncio.ensure_future(refresh(kp_id)): (title, kp_id) for title, kp_id in stale_objects}
+
+    try:
+        while tasks:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                title, kp_id = tasks.pop(task)
+                apply_refresh_result(storage, cinematograph_data, pending_objects, checkpoint, api_stop, title, kp_id, task)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    return not api_stop.is_set()
+
+
+@timed('stage.update')
+def update_cinematograph_json(
+    storage,
+    update_threshold,
+    api_key,
+    api_url,
+    api_concurrency,
+    api_image_concurrency,
+    api_rate_limit,
+    api_cache_path,
+    api_cache_ttl,
+    api_cache_max_size_mb,
+    json_queue_path,
+    checkpoint_every_titles,
+    checkpoint_every_seconds,
+    api_daily_budget,
+    json_refresh_state_path,
+    matching_picker,
+    matching_auto_accept_score,
+    matching_min_margin,
+    api_max_retries,
+    api_backoff_base,
+    api_backoff_max,
+    kinopoisk_fields,
+    api_mode,
+    api_async_concurrency
+):
+    """
+    Сопоставляет новые названия с Кинопоиском и обновляет устаревшие данные.
+
+    В режиме `api_mode = 'async'` поиск и обновление выполняются асинхронным
+    клиентом в одном общем цикле событий.
+
+    Returns:
+        set | None: Измененные названия и kp_id или `None` при ошибке.
+    """
     api_available = True
+    updated = set()
+    fields = compile_fields(kinopoisk_fields)
 
     try:
-        cinematograph_data = load_json(json_data_path, {}, logger)
-        cinematograph_experience = load_json(json_experience_path, {}, logger)
+        cinematograph_data = storage.load('data')
+        cinematograph_experience = storage.load('experience')
 
         if not cinematograph_experience:
-            return
+            return updated
+
+        remaining_budget = load_remaining_budget(json_refresh_state_path, api_daily_budget, logger)
+
+        if remaining_budget is not None:
+            logger.info("Доступно запросов к API на сегодня: %s", remaining_budget)
+
+        if api_mode not in ('sync', 'async'):
+            raise ValueError(f"Неизвестный api_mode: {api_mode}")
+
+        client_options = {
+            'rate_limit': api_rate_limit,
+            'cache_path': api_cache_path,
+            'cache_ttl': api_cache_ttl,
+            'cache_max_size_mb': api_cache_max_size_mb,
+            'request_limit': remaining_budget,
+            'max_retries': api_max_retries,
+            'backoff_base': api_backoff_base,
+            'backoff_max': api_backoff_max
+        }
+        loop = None
+
+        if api_mode == 'async':
+            client = create_async_client(api_key, api_url, concurrency=api_async_concurrency, **client_options)
+            loop = asyncio.new_event_loop()
+        else:
+            client = create_client(
+                api_key,
+                api_url,
+                pool_size=api_concurrency * max(1, api_image_concurrency),
+                **client_options
+            )
 
         all_titles = cinematograph_experience.keys()
+        update_threshold_days = update_threshold
         update_threshold = datetime.now() - timedelta(days=update_threshold)
 
-        for title in all_titles:
-            try:
-                kp_id = cinematograph_experience[title].get('kp_id')
-                need_search_by_api = not kp_id or kp_id not in cinematograph_data
-
-                if need_search_by_api and api_available:
-                    logger.info("ID не найдено для %s, ищем название через API...", title)
-                    new_data = updating_unknown_object(title, api_key)
-
-                    for new_info in new_data:
-                        webbrowser.open(f"https://www.kinopoisk.ru/film//{new_info['id']}")
-                        time.sleep(2)
-                        user_choice = show_message_box("Обновление данных", f"Это подходящая страница для: {title}")
-
-                        if user_choice == 1:
-                            new_info['date_update'] = (datetime.now() - timedelta(days=365)).strftime('%Y-%m-%d')
-                            cinematograph_data[new_info['id']] = new_info
-                            cinematograph_experience[title]['kp_id'] = str(new_info['id'])
-                            logger.info("Данные для %s обновлены и сохранены в cinematograph_experience.", title)
-                            break
-
-                if kp_id in cinematograph_data:
-                    data = cinematograph_data[kp_id]
-
-                    try:
-                        update_date = datetime.strptime(data['date_update'], '%Y-%m-%d')
-                    except ValueError:
-                        logger.error("Неверный формат даты для %s: %s. Обновляем данные.", title, data['date_update'])
-                        update_date = datetime(1970, 1, 1)  # Устанавливаем дату по умолчанию для некорректных значений
-
-                    if update_date < update_threshold and api_available:
-                        logger.info("Данные для %s устарели. Обновляем данные...", title)
-                        data = updating_known_object(data, api_key, kp_id)
-                        data = updating_object_images(data, api_key, kp_id)
-                        cinematograph_data[kp_id] = data
-            except ApiError:
-                api_available = False
-            except Exception as err:
-                logger.error("Ошибка при обновлении данных для %s: %s", title, err)
-
-        # Сохранение обновлённых данных
-        save_json(json_data_path, cinematograph_data, logger)
-        save_json(json_experience_path, cinematograph_experience, logger)
+        # Очередь прерванного запуска обрабатывается первой
+        pending_objects = load_json(json_queue_path, {}, logger) if os.path.exists(json_queue_path) else {}
+
+        if pending_objects:
+            logger.info("Продолжаем прерванное обновление: %s записей в очереди", len(pending_objects))
+
+        def save_progress(changed):
+            updated.update(changed['data'], changed['experience'])
+
+            # Сохраняются только изменённые записи (для JSON файл перезаписывается целиком)
+            if changed['data']:
+                storage.update('data', {kp_id: cinematograph_data[kp_id] for kp_id in changed['data']})
+
+            if changed['experience']:
+                storage.update('experience', {title: cinematograph_experience[title] for title in changed['experience']})
+
+            save_json(json_queue_path, pending_objects, logger)
+
+        checkpoint = Checkpoint(save_progress, checkpoint_every_titles, checkpoint_every_seconds)
+
+        def record_choices(choices):
+            for title, new_info in choices.items():
+                kp_id = str(new_info['id'])
+                new_info = project_record(new_info, fields)
+                new_info['date_update'] = (datetime.now() - timedelta(days=365)).strftime('%Y-%m-%d')
+                cinematograph_data[kp_id] = new_info
+                cinematograph_experience[title]['kp_id'] = kp_id
+                logger.info("Данные для %s обновлены и сохранены в cinematograph_experience.", title)
+                checkpoint.step('data', kp_id)
+                checkpoint.step('experience', title)
+
+        for kp_id in moving_images_to_side_store(cinematograph_data, storage):
+            checkpoint.changed['data'].add(kp_id)
+
+        try:
+            unmatched_titles = [
+                title for title in all_titles
+                if cinematograph_experience[title].get('kp_id') not in cinematograph_data
+            ]
+
+            if unmatched_titles:
+                logger.info("ID не найдено для %s записей, ищем названия через API...", len(unmatched_titles))
+                with timed('update.search'):
+                    if loop:
+                        candidates, api_available = loop.run_until_complete(
+                            search_candidates_async(unmatched_titles, client, logger)
+                        )
+                    else:
+                        candidates, api_available = search_candidates(unmatched_titles, client, api_concurrency, logger)
+
+                if matching_auto_accept_score is not None:
+                    hints = {title: get_title_hints(title, cinematograph_experience[title]) for title in candidates}
+                    accepted, candidates = resolve_candidates(
+                        candidates,
+                        hints,
+                        matching_auto_accept_score,
+                        matching_min_margin
+                    )
+                    logger.info(
+                        "Автоматически сопоставлено %s названий, требуют подтверждения: %s",
+                        len(accepted),
+                        len(candidates)
+                    )
+                    # Сохраняем до ручного выбора, чтобы не потерять при его прерывании
+                    record_choices(accepted)
+
+                record_choices(choose_candidates(candidates, matching_picker, logger))
+
+            for title in all_titles:
+                try:
+                    kp_id = cinematograph_experience[title].get('kp_id')
+
+                    if kp_id in cinematograph_data:
+                        data = cinematograph_data[kp_id]
+
+                        try:
+                            update_date = datetime.strptime(data['date_update'], '%Y-%m-%d')
+                        except ValueError:
+                            logger.error("Неверный формат даты для %s: %s. Обновляем данные.", title, data['date_update'])
+                            update_date = datetime(1970, 1, 1)  # Устанавливаем дату по умолчанию для некорректных значений
+
+                        if is_not_found_since(data, update_threshold):
+                            continue
+
+                        if update_date < update_threshold and kp_id not in pending_objects:
+                            logger.info("Данные для %s устарели. Обновляем данные...", title)
+                            pending_objects[kp_id] = title
+                except Exception as err:
+                    logger.error("Ошибка при обновлении данных для %s: %s", title, err)
+
+            for kp_id in [kp_id for kp_id in pending_objects if kp_id not in cinematograph_data]:
+                del pending_objects[kp_id]
+
+            # Запросы поиска новых записей уже израсходовали часть лимита
+            if remaining_budget is not None:
+                remaining_budget -= client.request_count
+
+            current_ids = {str(series.get('kp_id')) for series in storage.load('current').values()}
+            stale_objects, postponed_objects = select_refresh_candidates(
+                [(title, kp_id) for kp_id, title in pending_objects.items()],
+                cinematograph_data,
+                current_ids,
+                update_threshold_days,
+                remaining_budget
+            )
+
+            # Отложенные записи остаются в очереди и обновляются в следующие дни
+            if postponed_objects:
+                logger.info(
+                    "Обновление %s записей отложено: не хватает дневного лимита запросов к API",
+                    len(postponed_objects)
+                )
+
+            if stale_objects and api_available:
+                with timed('update.refresh'):
+                    if loop:
+                        loop.run_until_complete(refresh_stale_objects_async(
+                            storage,
+                            cinematograph_data,
+                            stale_objects,
+                            client,
+                            pending_objects,
+                            checkpoint,
+                            fields
+                        ))
+                    else:
+                        refresh_stale_objects(
+                            storage,
+                            cinematograph_data,
+                            stale_objects,
+                            client,
+                            api_concurrency,
+                            api_image_concurrency,
+                            pending_objects,
+                            checkpoint,
+                            fields
+                        )
+        finally:
+            # Сохранение обновлённых данных, в том числе при прерывании
+            checkpoint.flush()
+            update_relation_index(storage, cinematograph_data, logger)
+            client.log_summary(logger)
+
+            if loop:
+                loop.run_until_complete(client.aclose())
+                loop.close()
+            else:
+                client.close()
+
+            if api_daily_budget:
+                save_spent_requests(json_refresh_state_path, client.request_count, logger)
+
+        return updated
     except Exception as err:
         logger.error("Ошибка в функции update_cinematograph_json: %s", err)
 
+    return None
+
+
+def run_update(storage):
+    return update_cinematograph_json(
+        storage=storage,
+        update_threshold=config.update_threshold,
+        api_key=config.api_key,
+        api_url=config.api_url,
+        api_concurrency=config.api_concurrency,
+        api_image_concurrency=config.api_image_concurrency,
+        api_rate_limit=config.api_rate_limit,
+        api_cache_path=config.api_cache_path,
+        api_cache_ttl=config.api_cache_ttl,
+        api_cache_max_size_mb=config.api_cache_max_size_mb,
+        json_queue_path=config.json_update_queue_path,
+        checkpoint_every_titles=config.checkpoint_every_titles,
+        checkpoint_every_seconds=config.checkpoint_every_seconds,
+        api_daily_budget=config.api_daily_budget,
+        json_refresh_state_path=config.json_refresh_state_path,
+        matching_picker=config.matching_picker,
+        matching_auto_accept_score=config.matching_auto_accept_score,
+        matching_min_margin=config.matching_min_margin,
+        api_max_retries=config.api_max_retries,
+        api_backoff_base=config.api_backoff_base,
+        api_backoff_max=config.api_backoff_max,
+        kinopoisk_fields=config.kinopoisk_fields,
+        api_mode=config.api_mode,
+        api_async_concurrency=config.api_async_concurrency
+    )
+
 
 def main():
     try:
-        if not os.path.exists(config.json_experience_path):
-            save_json(config.json_experience_path, {}, logger)
-
-        if not os.path.exists(config.json_data_path):
-            save_json(config.json_data_path, {}, logger)
-
-        update_cinematograph_json(
-            json_data_path=config.json_data_path,
-            json_experience_path=config.json_experience_path,
-            update_threshold=config.update_threshold,
-            api_key=config.api_key
-        )
+        storage = open_storage(logger)
+
+        try:
+            updated = run_update(storage)
+        finally:
+            storage.close()
+
+        # При запуске из конвейера в отдельном процессе измененные названия и kp_id
+        # передаются через файл, путь к которому указан в аргументе
+        if len(sys.argv) > 1:
+            save_json(sys.argv[1], sorted(updated) if updated is not None else None, logger)
     except Exception as err:
         logger.error("Ошибка в функции main: %s", err)
 
 
-logger = set_logger(log_folder=config.log_folder, log_subfolder_name='cinematograph_data_updater')
+# Логгер настраивается только при запуске скрипта, при импорте в конвейер
+# используется уже настроенный корневой логгер
+logger = logging.getLogger()
 
 if __name__ == "__main__":
+    logger = set_logger(
+        log_folder=config.log_folder,
+        log_subfolder_name='cinematograph_data_updater',
+        metrics_folder=config.metrics_folder
+    )
+
     main()
\ No newline at end of file
@@ -4,8 +4,20 @@ json_experience_path = "cinematograph.json"
 json_data_path = "cinematograph_data.json"
 json_current_path = "current_cinematograph.json"
 json_exceptions_path = "cinematograph_exceptions.json"
+json_update_queue_path = "cinematograph_update_queue.json"
+json_images_folder = "cinematograph_images"  # Кадры хранятся отдельно, по файлу на kp_id
+json_relations_path = "cinematograph_relations.json"  # Обратный индекс сиквелов и приквелов
+json_data_compact = True  # Сохранять cinematograph_data.json без отступов (быстрее и меньше по размеру)
+storage_backend = "json"  # "json" или "sqlite" (перенос данных: migrate_to_sqlite.py)
+sqlite_path = "cinematograph.db"
 cinematograph_notes_folder = "path/to/the/Obsidian/folder/dedicated/to/cinematography"
+notes_manifest_file_name = ".cinematograph_notes_manifest.json"
+notes_workers = None  # Количество процессов для генерации заметок (None — по числу ядер, как у ProcessPoolExecutor по умолчанию, в Windows не больше 61; 1 — без параллельности)
+unwatched_report_file_name = "Непросмотренное из франшиз.md"  # Отчет о непросмотренных сиквелах и приквелах (None — не создавать)
+stats_file_name = "Статистика просмотров.md"  # Заметка со статистикой библиотеки (None — не создавать)
 log_folder = None
+metrics_folder = None  # Папка для JSON сводок времени выполнения (None — только вывод в лог)
+in_process_pipeline = True  # False — запускать этапы отдельными процессами
 
 replacements_file_name = {
     ":": "",
@@ -21,4 +33,34 @@ replacements_file_content = {
     "\r": "\n\n"
 }
 
-api_key = 'YOU_API_KEY'
\ No newline at end of file
+api_key = 'YOU_API_KEY'
+api_url = 'https://api.kinopoisk.dev'
+api_concurrency = 8  # Количество одновременных запросов к API
+api_mode = "sync"  # "sync" — requests и потоки, "async" — asyncio и aiohttp (pip install aiohttp)
+api_async_concurrency = 64  # Количество одновременных запросов к API в режиме "async"
+api_image_concurrency = 4  # Количество одновременно загружаемых страниц изображений одной записи
+api_rate_limit = 10  # Запросов в секунду
+api_cache_path = "kinopoisk_cache.db"  # Кэш ответов API (None — без кэша)
+api_cache_ttl = 24 * 60 * 60  # Время жизни ответа в кэше, секунд
+api_cache_max_size_mb = 200
+api_daily_budget = 200  # Запросов к API в сутки (None — без ограничений)
+api_max_retries = 4  # Повторов запроса при 429, 5xx и сетевых ошибках
+api_backoff_base = 1.0  # Начальная задержка перед повтором, секунд (растет вдвое, со случайным разбросом)
+api_backoff_max = 60.0  # Максимальная задержка, секунд; при большем Retry-After запрос не повторяется
+# Поля записей Кинопоиска, которые сохраняются в cinematograph_data (None — ответ API целиком).
+# Вложенные поля указываются через точку, для списков — поле каждого элемента.
+# После изменения списка сократите сохраненные записи: python slim_cinematograph_data.py
+kinopoisk_fields = (
+    'id', 'name', 'alternativeName', 'enName', 'type', 'year', 'description',
+    'rating.kp', 'rating.imdb', 'genres.name', 'poster.url', 'isSeries', 'status', 'releaseYears',
+    'seasonsInfo.number', 'seasonsInfo.episodesCount',
+    'sequelsAndPrequels.id', 'sequelsAndPrequels.name', 'sequelsAndPrequels.alternativeName',
+    'sequelsAndPrequels.year', 'sequelsAndPrequels.type', 'sequelsAndPrequels.poster.url'
+)
+json_refresh_state_path = "cinematograph_refresh_state.json"  # Израсходованный за сутки лимит запросов
+matching_picker = "terminal"  # Выбор записей Кинопоиска для новых названий: "terminal" или "html"
+matching_auto_accept_score = 0.85  # Оценка совпадения (0–1), с которой вариант выбирается без подтверждения (None — всегда спрашивать)
+matching_min_margin = 0.1  # Минимальный отрыв от следующего варианта для автоматического выбора
+
+checkpoint_every_titles = 25  # Промежуточное сохранение каждые N обновленных записей
+checkpoint_every_seconds = 60  # или каждые T секунд
\ No newline at end of file
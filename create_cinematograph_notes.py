@@ -1,13 +1,39 @@
 import os
+import sys
+import json
 import hashlib
+import logging
+import tempfile
 import subprocess
 
-from prettytable import PrettyTable
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 import config
 
 from set_logger import set_logger
+from storage import open_storage
+from cinematograph_data_updater import run_update
 from utils_json import load_json, save_json
+from instrumentation import count, timed
+from library_stats import build_library_stats
+from record_schema import normalize_ids
+from relation_index import build_relation_index, get_referencing_ids
+
+
+# Увеличивается при изменении формата заметок, чтобы манифест не пропускал устаревшие файлы
+NOTES_MANIFEST_VERSION = 2
+
+# Меньше этого количества заметок запуск пула процессов обходится дороже самой генерации
+PARALLEL_RENDER_MIN_NOTES = 200
+
+# ProcessPoolExecutor в Windows не принимает max_workers больше 61
+WINDOWS_MAX_WORKERS = 61
+
+# Более поздние сиквелы и приквелы еще не вышли и в заметки не попадают
+MAX_RELATED_YEAR = 2024
+
+# Общие для всех заметок данные в процессе-обработчике (см. init_render_worker)
+render_context = {}
 
 
 def normalize_newlines(text, replacements_file_name):
@@ -24,59 +50,88 @@ def normalize_newlines(text, replacements_file_name):
         return ''
 
 
-def save_md(data, file_path, replacements_file_name):
+def write_md(data, file_path, replacements_file_name):
+    """
+    Записывает заметку, если ее содержимое изменилось.
+
+    Returns:
+        str | None: `'same'`, `'changed'` или `'new'`; `None` при ошибке.
+    """
+    file_name = os.path.basename(file_path)
+
     try:
-        data = normalize_newlines(data, replacements_file_name)
-        data_hash = hashlib.md5(data.encode('utf-8')).hexdigest()
-        file_name = os.path.basename(file_path)
+        with timed('notes.hash'):
+            data = normalize_newlines(data, replacements_file_name)
+            data_hash = hashlib.md5(data.encode('utf-8')).hexdigest()
 
-        if os.path.exists(file_path):
-            with open(file_path, "r", encoding='utf-8') as file:
-                existing_data = normalize_newlines(file.read(), replacements_file_name)
-                existing_hash = hashlib.md5(existing_data.encode('utf-8')).hexdigest()
+            if os.path.exists(file_path):
+                with open(file_path, "r", encoding='utf-8') as file:
+                    existing_data = normalize_newlines(file.read(), replacements_file_name)
+                    existing_hash = hashlib.md5(existing_data.encode('utf-8')).hexdigest()
 
-            if existing_hash == data_hash:
-                return
+                if existing_hash == data_hash:
+                    count('notes.same')
 
-            logger.info("Различия в файле: %s", file_name)
-        else:
-            logger.info("Новый файл %s", file_name)
+                    return 'same'
+
+                status = 'changed'
+            else:
+                status = 'new'
+
+        with timed('notes.write'):
+            with open(file_path, "w", encoding='utf-8') as file:
+                file.write(data)
 
-        with open(file_path, "w", encoding='utf-8') as file:
-            file.write(data)
+        count(f'notes.{status}')
 
+        return status
     except Exception as err:
         logger.error("Ошибка при сохранении файла %s: %s", file_name, err)
 
+        return None
 
-def prettytable_to_markdown(pt: PrettyTable):
-    try:
-        md_table = []
 
-        headers = [f" {field} " for field in pt.field_names]
-        md_table.append("|" + "|".join(headers) + "|")
+def log_md_status(status, file_path):
+    if status == 'changed':
+        logger.info("Различия в файле: %s", os.path.basename(file_path))
+    elif status == 'new':
+        logger.info("Новый файл %s", os.path.basename(file_path))
 
-        separator = [":---:" for _ in pt.field_names]
-        md_table.append("|" + "|".join(separator) + "|")
 
-        for row in pt._rows:
-            md_row = []
+def save_md(data, file_path, replacements_file_name):
+    status = write_md(data, file_path, replacements_file_name)
+    log_md_status(status, file_path)
 
-            for cell in row:
-                if isinstance(cell, list):
-                    md_row.append(f" {'<br>'.join(str(item) for item in cell)} ")
-                else:
-                    md_row.append(f" {cell} ")
+    return status is not None
 
-            md_table.append("|" + "|".join(md_row) + "|")
 
-        return "\n".join(md_table)
-    except Exception as err:
-        logger.error("Ошибка при преобразовании таблицы в Markdown: %s", err)
+def build_md_table(columns, values):
+    md_table = []
 
-        return ''
+    headers = [f" {field} " for field in columns]
+    md_table.append("|" + "|".join(headers) + "|")
+
+    separator = [":---:" for _ in columns]
+    md_table.append("|" + "|".join(separator) + "|")
+
+    for row in values:
+        if len(row) != len(columns):
+            raise ValueError(f"Строка содержит {len(row)} значений, а колонок {len(columns)}")
+
+        md_row = []
+
+        for cell in row:
+            if isinstance(cell, list):
+                md_row.append(f" {'<br>'.join(str(item) for item in cell)} ")
+            else:
+                md_row.append(f" {cell} ")
+
+        md_table.append("|" + "|".join(md_row) + "|")
+
+    return "\n".join(md_table)
 
 
+@timed('notes.table')
 def create_md_table(columns_and_values):
     try:
         columns, values = columns_and_values
@@ -84,15 +139,7 @@ def create_md_table(columns_and_values):
         if not columns or not values:
             return None
 
-        table = PrettyTable()
-        table.field_names = columns
-
-        for row in values:
-            table.add_row(row)
-
-        table = prettytable_to_markdown(table)
-
-        return table
+        return build_md_table(columns, values)
     except Exception as err:
         logger.error("Ошибка при создании Markdown таблицы: %s", err)
 
@@ -154,12 +201,12 @@ def get_sequels_and_prequels_columns_and_values(all_ids, data, info, exceptions,
                 if item['name'] is None or item['poster']['url'] is None:
                     continue
 
-                id_in_exceptions = str(item['id']) in exceptions
+                id_in_exceptions = item['id'] in exceptions
                 content_in_local_data = item['id'] in all_ids
                 item_name = item['name']
 
                 if 'year' in item and item['year'] != 'None' and item['year'] is not None:
-                    if int(item['year']) > 2024:
+                    if int(item['year']) > MAX_RELATED_YEAR:
                         continue
 
                     item_name += f" ({item['year']})"
@@ -263,20 +310,277 @@ def create_md_content(info, data, experience_data, all_ids, exceptions, replacem
         return ''
 
 
+def get_cinematograph_title(title, data, name_counts, replacements_file_name):
+    # Название из Кинопоиска используется, только если оно уникально в cinematograph_data
+    if data['name'] and name_counts[data['name']] < 2:
+        cinematograph_title = data['name']
+    else:
+        cinematograph_title = title
+
+    for old, new in replacements_file_name.items():
+        cinematograph_title = cinematograph_title.replace(old, new)
+
+    return cinematograph_title
+
+
+@timed('notes.fingerprint')
+def get_note_fingerprint(title, experience_data, data, current_series, exceptions, all_ids, replacements):
+    try:
+        # Вид ссылки на связанный контент зависит от all_ids и exceptions,
+        # поэтому в отпечаток попадают только влияющие на заметку признаки
+        related = [
+            [item.get('id'), item.get('id') in all_ids, item.get('id') in exceptions]
+            for item in data.get('sequelsAndPrequels') or []
+        ]
+        inputs = {
+            'version': NOTES_MANIFEST_VERSION,
+            'title': title,
+            'experience': experience_data,
+            'data': data,
+            'current': current_series.get(title),
+            'in_exceptions': data.get('id') in exceptions,
+            'related': related,
+            'replacements': replacements
+        }
+        serialized = json.dumps(inputs, ensure_ascii=False, sort_keys=True, default=str)
+
+        return hashlib.md5(serialized.encode('utf-8')).hexdigest()
+    except Exception as err:
+        logger.error("Ошибка при вычислении отпечатка заметки %s: %s", title, err)
+
+        return None
+
+
+def get_affected_titles(targets, cinematograph_experience, cinematograph_data, relations, stats):
+    """
+    Находит заметки, на которые влияет изменение `targets`.
+
+    Кроме самих заметок затрагиваются заметки, в таблицах сиквелов и приквелов
+    которых есть измененные записи (вид ссылки зависит от `all_ids`),
+    и заметки с тем же названием Кинопоиска (от него зависит имя файла).
+
+    Args:
+        targets (set): Измененные названия и kp_id.
+        cinematograph_experience (dict): История просмотров по названию.
+        cinematograph_data (dict): Данные Кинопоиска по kp_id.
+        relations (dict): Обратный индекс сиквелов и приквелов.
+        stats (dict): Индексы библиотеки (см. `build_library_stats`).
+
+    Returns:
+        set: Названия заметок для обновления.
+    """
+    target_ids = {
+        str(cinematograph_experience[target].get('kp_id')) if target in cinematograph_experience else target
+        for target in targets
+    }
+    target_names = {
+        cinematograph_data[kp_id].get('name')
+        for kp_id in target_ids
+        if kp_id in cinematograph_data
+    }
+    affected_ids = target_ids | get_referencing_ids(relations, target_ids)
+
+    affected_titles = {title for kp_id in affected_ids for title in stats['titles_by_id'].get(kp_id, ())}
+    affected_titles.update(title for name in target_names for title in stats['titles_by_name'].get(name, ()))
+
+    return affected_titles
+
+
+def create_unwatched_report(relations, cinematograph_data, note_titles, all_ids, exceptions):
+    """
+    Создает заметку со списком непросмотренных сиквелов и приквелов.
+
+    Args:
+        relations (dict): Обратный индекс сиквелов и приквелов.
+        cinematograph_data (dict): Данные Кинопоиска по kp_id.
+        note_titles (dict): Названия заметок просмотренных записей по kp_id.
+        all_ids (frozenset): kp_id просмотренных записей.
+        exceptions (frozenset): kp_id исключений.
+
+    Returns:
+        str | None: Содержимое заметки или `None` при ошибке.
+    """
+    try:
+        rows = []
+
+        for related_id, referencing_ids in relations.items():
+            if related_id in all_ids or related_id in exceptions:
+                continue
+
+            watched_ids = [kp_id for kp_id in referencing_ids if kp_id in note_titles]
+
+            if not watched_ids:
+                continue
+
+            item = next(
+                (
+                    item for item in cinematograph_data[watched_ids[0]].get('sequelsAndPrequels') or []
+                    if item.get('id') == related_id
+                ),
+                None
+            )
+
+            if item is None or item.get('name') is None:
+                continue
+
+            year = item.get('year') if item.get('year') != 'None' else None
+
+            if year is not None and int(year) > MAX_RELATED_YEAR:
+                continue
+
+            rows.append([
+                f"[{item['name']}](https://www.kinopoisk.ru/film/{related_id}/)",
+                year or '',
+                ', '.join(f"[[{note_titles[kp_id]}]]" for kp_id in watched_ids)
+            ])
+
+        rows.sort(key=lambda row: (str(row[1]), row[0]))
+        table = create_md_table((['Название', 'Год', 'Связано с'], rows))
+
+        return '\n'.join(['---', "tag: ['#Cinematograph']", '---', f"Непросмотрено: {len(rows)}", f"\n{table}" if table else ''])
+    except Exception as err:
+        logger.error("Ошибка при создании отчета о непросмотренных сиквелах и приквелах: %s", err)
+
+        return None
+
+
+def create_stats_note(stats):
+    """
+    Создает заметку со статистикой библиотеки по данным `build_library_stats`.
+
+    Returns:
+        str | None: Содержимое заметки или `None` при ошибке.
+    """
+    try:
+        tables = [
+            ('По годам выхода', 'Год', sorted(stats['by_year'].items(), reverse=True)),
+            ('По жанрам', 'Жанр', stats['by_genre'].most_common()),
+            # Числовые оценки по убыванию, нечисловые после них
+            ('По оценкам', 'Оценка', sorted(
+                stats['by_rating'].items(),
+                key=lambda item: (1, 0, item[0]) if isinstance(item[0], str) else (0, -item[0], '')
+            )),
+            ('Просмотры по месяцам', 'Месяц', sorted(stats['by_month'].items(), reverse=True))
+        ]
+
+        text = [
+            '---',
+            "tag: ['#Cinematograph']",
+            f"movies: {stats['count_movies']}",
+            f"series: {stats['count_series']}",
+            f"viewings: {stats['count_viewings']}",
+            '---'
+        ]
+
+        for header, column, rows in tables:
+            table = create_md_table(([column, 'Количество'], [list(row) for row in rows]))
+
+            if table:
+                text.extend([f"\n## {header}", f"\n{table}"])
+
+        return '\n'.join(text)
+    except Exception as err:
+        logger.error("Ошибка при создании заметки со статистикой: %s", err)
+
+        return None
+
+
+def render_note(job, current_series, exceptions, all_ids, replacements_file_name):
+    title, experience_data, data = job[:3]
+    info = create_info(data, title, experience_data, current_series, exceptions)
+
+    return create_md_content(info, data, experience_data, all_ids, exceptions, replacements_file_name)
+
+
+def init_render_worker(context):
+    render_context.update(context)
+
+
+def render_note_in_worker(job):
+    return render_note(job, **render_context)
+
+
+def render_and_save_notes(jobs, context, replacements_file_content, notes_workers):
+    """
+    Генерирует и записывает заметки, возвращая `(job, status)` в порядке `jobs`.
+
+    При `notes_workers > 1` Markdown собирается в пуле процессов, а сравнение
+    с файлами и запись выполняются в пуле потоков. Порядок результатов
+    сохраняется, поэтому логи совпадают с последовательным режимом.
+
+    Args:
+        jobs (list): Кортежи `(title, experience_data, data, file_path, fingerprint)`.
+        context (dict): Общие аргументы `render_note`.
+        replacements_file_content (dict): Замены для содержимого файла.
+        notes_workers (int | None): Количество процессов и потоков, `None` — по числу ядер,
+            как у `ProcessPoolExecutor` по умолчанию.
+    """
+    notes_workers = notes_workers or os.cpu_count() or 1
+
+    if sys.platform == 'win32':
+        notes_workers = min(notes_workers, WINDOWS_MAX_WORKERS)
+
+    if notes_workers <= 1 or len(jobs) < PARALLEL_RENDER_MIN_NOTES:
+        for job in jobs:
+            content = render_note(job, **context)
+            yield job, write_md(content, job[3], replacements_file_content)
+
+        return
+
+    chunksize = max(1, len(jobs) // (notes_workers * 4))
+
+    with ProcessPoolExecutor(notes_workers, initializer=init_render_worker, initargs=(context,)) as processes, \
+            ThreadPoolExecutor(notes_workers) as threads:
+        contents = processes.map(render_note_in_worker, [job[:3] for job in jobs], chunksize=chunksize)
+        futures = [
+            threads.submit(write_md, content, job[3], replacements_file_content)
+            for job, content in zip(jobs, contents)
+        ]
+
+        for job, future in zip(jobs, futures):
+            yield job, future.result()
+
+
+@timed('stage.notes')
 def update_cinematograph_notes(
     notes_folder,
     replacements_file_name,
     replacements_file_content,
-    json_experience_path,
-    json_data_path,
-    json_current_path,
-    json_exceptions_path
+    storage,
+    notes_manifest_file_name=None,
+    notes_workers=1,
+    targets=None,
+    unwatched_report_file_name=None,
+    stats_file_name=None
 ):
+    """
+    Создает и обновляет заметки по истории просмотров.
+
+    Args:
+        notes_folder (str): Папка заметок.
+        replacements_file_name (dict): Замены для имен файлов.
+        replacements_file_content (dict): Замены для содержимого файлов.
+        storage (JsonStorage | SqliteStorage): Хранилище данных.
+        notes_manifest_file_name (str, optional): Имя файла манифеста в папке заметок.
+        notes_workers (int | None): Количество процессов, `None` — по числу ядер.
+        targets (set, optional): Измененные названия и kp_id. Если указаны,
+            обновляются только затронутые ими заметки.
+        unwatched_report_file_name (str, optional): Имя заметки со списком
+            непросмотренных сиквелов и приквелов.
+        stats_file_name (str, optional): Имя заметки со статистикой библиотеки.
+    """
     try:
-        cinematograph_experience = load_json(json_experience_path, {}, logger)
-        cinematograph_data = load_json(json_data_path, {}, logger)
-        current_series = load_json(json_current_path, {}, logger)
-        exceptions = load_json(json_exceptions_path, [], logger)
+        # Копия истории: ниже в нее добавляются текущие сериалы, а хранилище
+        # может быть общим с другими этапами конвейера
+        cinematograph_experience = {
+            title: dict(value, experience=list(value['experience']))
+            for title, value in storage.load('experience').items()
+        }
+        # Записи, сохраненные до приведения id к строкам, приводятся при загрузке
+        cinematograph_data = {kp_id: normalize_ids(data) for kp_id, data in storage.load('data').items()}
+        current_series = storage.load('current')
+        # kp_id бывают и числами, и строками: для проверок за O(1) приводим все к строкам
+        exceptions = frozenset(str(kp_id) for kp_id in storage.load('exceptions'))
 
         if not cinematograph_experience:
             return
@@ -286,25 +590,24 @@ def update_cinematograph_notes(
 
         os.makedirs(notes_folder, exist_ok=True)
 
-        all_titles = set(cinematograph_experience.keys())
-        all_ids = [int(value['kp_id']) for title, value in cinematograph_experience.items()]
+        with timed('notes.stats'):
+            stats = build_library_stats(cinematograph_experience, current_series, cinematograph_data)
 
-        count_movies = len([
-            value['kp_id']
-            for title, value in cinematograph_experience.items()
-            if not cinematograph_data[value['kp_id']]['isSeries']
-        ])
+        all_titles = stats['all_titles']
+        all_ids = stats['all_ids']
+        name_counts = stats['name_counts']
 
-        all_series = cinematograph_experience | current_series
+        logger.info("Всего фильмов: %s", stats['count_movies'])
+        logger.info("Всего сериалов: %s", stats['count_series'])
 
-        count_series = len([
-            value['kp_id']
-            for title, value in all_series.items()
-            if cinematograph_data[value['kp_id']]['isSeries']
-        ])
+        # Индекс строится при обновлении данных, без него строим в памяти
+        relations = storage.load('relations') or build_relation_index(cinematograph_data)
 
-        logger.info("Всего фильмов: %s", count_movies)
-        logger.info("Всего сериалов: %s", count_series)
+        manifest_path = os.path.join(notes_folder, notes_manifest_file_name) if notes_manifest_file_name else None
+        manifest = load_json(manifest_path, {}, logger) if manifest_path and os.path.exists(manifest_path) else {}
+        # При выборочном обновлении остальные заметки не проверяются и остаются в манифесте
+        new_manifest = dict(manifest) if targets is not None else {}
+        count_skipped = 0
 
         for title in current_series:
             try:
@@ -324,60 +627,202 @@ def update_cinematograph_notes(
             except Exception as err:
                 logger.error("Ошибка обработки текущего сериала %s: %s", title, err)
 
+        jobs = []
+        titles = cinematograph_experience
+
+        if targets is not None:
+            titles = get_affected_titles(targets, cinematograph_experience, cinematograph_data, relations, stats)
+            logger.info("Выборочное обновление заметок: %s из %s", len(titles), len(cinematograph_experience))
+
         for title, data in cinematograph_experience.items():
+            if title not in titles:
+                continue
+
             try:
                 experience_data = data['experience']
                 kp_id = cinematograph_experience[title]['kp_id']
                 data = cinematograph_data[kp_id]
-                info = create_info(data, title, experience_data, current_series, exceptions)
-                content = create_md_content(info, data, experience_data, all_ids, exceptions, replacements_file_name)
-
-                title_count = sum(
-                    1
-                    for key in cinematograph_data
-                    if cinematograph_data[kp_id]['name'] == cinematograph_data[key]['name']
-                )
-
-                if cinematograph_data[kp_id]['name'] and title_count < 2:
-                    cinematograph_title = cinematograph_data[kp_id]['name']
-                else:
-                    cinematograph_title = title
-
-                for old, new in replacements_file_name.items():
-                    cinematograph_title = cinematograph_title.replace(old, new)
+                cinematograph_title = get_cinematograph_title(title, data, name_counts, replacements_file_name)
+                note_name = f"{cinematograph_title}.md"
+                file_path = os.path.join(notes_folder, note_name)
+
+                fingerprint = None
+
+                if manifest_path:
+                    fingerprint = get_note_fingerprint(
+                        title,
+                        experience_data,
+                        data,
+                        current_series,
+                        exceptions,
+                        all_ids,
+                        [replacements_file_name, replacements_file_content]
+                    )
+
+                    # Манифест хранит имена заметок, чтобы папку можно было перенести
+                    if fingerprint and manifest.get(note_name) == fingerprint and os.path.exists(file_path):
+                        new_manifest[note_name] = fingerprint
+                        count_skipped += 1
+                        continue
 
-                file_path = os.path.join(notes_folder, f"{cinematograph_title}.md")
-                save_md(content, file_path, replacements_file_content)
+                jobs.append((title, experience_data, data, file_path, fingerprint))
             except Exception as err:
                 logger.error("Ошибка при обновлении заметки %s: %s", title, err)
+
+        context = {
+            'current_series': current_series,
+            'exceptions': exceptions,
+            'all_ids': all_ids,
+            'replacements_file_name': replacements_file_name
+        }
+
+        with timed('notes.render'):
+            for (title, _, _, file_path, fingerprint), status in render_and_save_notes(
+                jobs,
+                context,
+                replacements_file_content,
+                notes_workers
+            ):
+                log_md_status(status, file_path)
+
+                if status is not None and fingerprint:
+                    new_manifest[os.path.basename(file_path)] = fingerprint
+
+        if stats_file_name:
+            stats_note = create_stats_note(stats)
+
+            if stats_note is not None:
+                save_md(stats_note, os.path.join(notes_folder, stats_file_name), replacements_file_content)
+
+        if unwatched_report_file_name:
+            note_titles = {
+                str(value['kp_id']): get_cinematograph_title(
+                    title,
+                    cinematograph_data[value['kp_id']],
+                    name_counts,
+                    replacements_file_name
+                )
+                for title, value in cinematograph_experience.items()
+                if value.get('kp_id') in cinematograph_data
+            }
+            report_path = os.path.join(notes_folder, unwatched_report_file_name)
+            report = create_unwatched_report(relations, cinematograph_data, note_titles, all_ids, exceptions)
+
+            if report is not None:
+                save_md(report, report_path, replacements_file_content)
+
+        if manifest_path:
+            count('notes.skipped_by_manifest', count_skipped)
+            logger.info("Заметок без изменений (по манифесту): %s", count_skipped)
+            save_json(manifest_path, new_manifest, logger)
     except Exception as err:
         logger.error("Ошибка в функции update_cinematograph_notes: %s", err, exc_info=True)
 
 
+def run_notes(storage, targets=None):
+    update_cinematograph_notes(
+        notes_folder=config.cinematograph_notes_folder,
+        replacements_file_name=config.replacements_file_name,
+        replacements_file_content=config.replacements_file_content,
+        storage=storage,
+        notes_manifest_file_name=config.notes_manifest_file_name,
+        notes_workers=config.notes_workers,
+        targets=targets,
+        unwatched_report_file_name=config.unwatched_report_file_name,
+        stats_file_name=config.stats_file_name
+    )
+
+
+def run_update_process():
+    """
+    Запускает обновление данных отдельным процессом.
+
+    Returns:
+        set | None: Измененные названия и kp_id или `None`, если они неизвестны.
+    """
+    fd, updated_path = tempfile.mkstemp(prefix='cinematograph_updated.', suffix='.json')
+    os.close(fd)
+
+    try:
+        # Пустой файл остается, если процесс завершился до записи результата
+        subprocess.run([sys.executable, 'cinematograph_data_updater.py', updated_path], check=True)
+
+        if not os.path.getsize(updated_path):
+            return None
+
+        updated = load_json(updated_path, None, logger)
+
+        return set(updated) if isinstance(updated, list) else None
+    finally:
+        os.remove(updated_path)
+
+
+def run_pipeline(storage, targets=None):
+    """
+    Обновляет данные Кинопоиска и заметки в одном процессе.
+
+    Оба этапа используют одно хранилище, поэтому данные, загруженные
+    при обновлении, повторно с диска не читаются.
+
+    Если `config.in_process_pipeline` выключен, обновление данных
+    запускается отдельным процессом, как раньше. Измененные им названия
+    и kp_id он записывает во временный файл.
+
+    Args:
+        storage (JsonStorage | SqliteStorage): Хранилище данных.
+        targets (set, optional): Измененные названия и kp_id. Если указаны,
+            обновляются только затронутые ими и обновлением данных заметки.
+    """
+    if config.in_process_pipeline:
+        updated = run_update(storage)
+    else:
+        updated = run_update_process()
+
+    # Если неизвестно, что изменило обновление данных, обновляются все заметки
+    if targets is not None and updated is not None:
+        targets = set(targets) | updated
+    else:
+        targets = None
+
+    run_notes(storage, targets)
+
+
+def read_targets(argv):
+    """
+    Названия или kp_id для выборочного обновления заметок: из аргументов
+    или, если передан единственный аргумент `-`, из stdin по одному в строке
+    (список после импорта истории может не поместиться в командную строку).
+
+    Returns:
+        set | None: Цели или `None` для обновления всех заметок.
+    """
+    if argv == ['-']:
+        return {line for line in sys.stdin.buffer.read().decode('utf-8').splitlines() if line} or None
+
+    return set(argv) or None
+
+
 def main():
     try:
-        if not os.path.exists(config.json_experience_path):
-            save_json(config.json_experience_path, {}, logger)
-
-        if not os.path.exists(config.json_data_path):
-            save_json(config.json_data_path, {}, logger)
-
-        subprocess.run(['python', 'cinematograph_data_updater.py'], shell=True, check=True)
-
-        update_cinematograph_notes(
-            notes_folder=config.cinematograph_notes_folder,
-            replacements_file_name=config.replacements_file_name,
-            replacements_file_content=config.replacements_file_content,
-            json_experience_path=config.json_experience_path,
-            json_data_path=config.json_data_path,
-            json_current_path=config.json_current_path,
-            json_exceptions_path=config.json_exceptions_path
-        )
+        storage = open_storage(logger)
+
+        try:
+            run_pipeline(storage, read_targets(sys.argv[1:]))
+        finally:
+            storage.close()
     except Exception as err:
         logger.error("Ошибка в функции main: %s", err, exc_info=True)
 
 
-logger = set_logger(log_folder=config.log_folder, log_subfolder_name='create_cinematograph_notes')
+# Логгер настраивается только при запуске скрипта, при импорте в конвейер
+# используется уже настроенный корневой логгер
+logger = logging.getLogger()
 
 if __name__ == "__main__":
+    logger = set_logger(
+        log_folder=config.log_folder,
+        log_subfolder_name='create_cinematograph_notes',
+        metrics_folder=config.metrics_folder
+    )
+
     main()
\ No newline at end of file
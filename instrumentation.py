@@ -0,0 +1,143 @@
+"""
+Модуль замера времени этапов и счетчиков событий.
+
+Замеры копятся в общем объекте `metrics` и в конце запуска выводятся
+таблицей в лог (см. `set_logger`), при необходимости сохраняются в JSON.
+"""
+import os
+import json
+import time
+import threading
+
+from datetime import datetime
+from functools import wraps
+
+
+class Metrics:
+    """
+    Потокобезопасное хранилище замеров: время по этапам и счетчики.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timings = {}
+        self.counters = {}
+
+    def add_time(self, name, seconds):
+        with self.lock:
+            timing = self.timings.get(name)
+
+            if timing is None:
+                self.timings[name] = {'calls': 1, 'total': seconds, 'max': seconds}
+            else:
+                timing['calls'] += 1
+                timing['total'] += seconds
+
+                if seconds > timing['max']:
+                    timing['max'] = seconds
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def reset(self):
+        with self.lock:
+            self.timings = {}
+            self.counters = {}
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                'timings': {name: dict(timing) for name, timing in self.timings.items()},
+                'counters': dict(self.counters)
+            }
+
+
+metrics = Metrics()
+
+
+class Timer:
+    """
+    Замеряет время выполнения блока (`with`) или каждого вызова функции (декоратор).
+    """
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+        return self
+
+    def __exit__(self, *exc_info):
+        metrics.add_time(self.name, time.perf_counter() - self.start)
+
+    def __call__(self, function):
+        name = self.name
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+
+            try:
+                return function(*args, **kwargs)
+            finally:
+                metrics.add_time(name, time.perf_counter() - start)
+
+        return wrapper
+
+
+def timed(name):
+    """
+    Замеряет время выполнения блока или функции.
+
+    Используется как контекстный менеджер (`with timed('json.load'):`)
+    или как декоратор (`@timed('notes.table')`).
+    """
+    return Timer(name)
+
+
+def count(name, value=1):
+    metrics.count(name, value)
+
+
+def format_summary(summary):
+    lines = [f"{'Этап':<40} {'Вызовов':>9} {'Всего, с':>10} {'Среднее, мс':>12} {'Макс, мс':>10}"]
+
+    for name, timing in sorted(summary['timings'].items(), key=lambda item: item[1]['total'], reverse=True):
+        lines.append(
+            f"{name:<40} {timing['calls']:>9} {timing['total']:>10.3f} "
+            f"{timing['total'] / timing['calls'] * 1000:>12.2f} {timing['max'] * 1000:>10.2f}"
+        )
+
+    if summary['counters']:
+        lines.append('')
+        lines.append(f"{'Счетчик':<40} {'Значение':>9}")
+        lines.extend(f"{name:<40} {value:>9}" for name, value in sorted(summary['counters'].items()))
+
+    return '\n'.join(lines)
+
+
+def log_summary(logger, metrics_folder=None):
+    """
+    Выводит таблицу замеров в лог и, если указана папка, сохраняет их в JSON
+    файл с именем в формате `YYYY-MM-DD HH-MM-SS.json`.
+
+    Args:
+        logger (logging.Logger): Логгер.
+        metrics_folder (str, optional): Папка для JSON отчетов.
+    """
+    summary = metrics.to_dict()
+
+    if not summary['timings'] and not summary['counters']:
+        return
+
+    logger.info("Сводка по времени выполнения:\n%s", format_summary(summary))
+
+    if metrics_folder:
+        os.makedirs(metrics_folder, exist_ok=True)
+        file_path = os.path.join(metrics_folder, datetime.now().strftime('%Y-%m-%d %H-%M-%S.json'))
+
+        with open(file_path, 'w', encoding='utf-8') as file:
+            json.dump(summary, file, ensure_ascii=False, indent=4)
\ No newline at end of file
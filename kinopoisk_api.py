@@ -0,0 +1,603 @@
+"""
+Модуль для работы с API Кинопоиска (kinopoisk.dev).
+"""
+import re
+import json
+import time
+import random
+import asyncio
+import threading
+
+import requests
+
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+from requests.adapters import HTTPAdapter
+
+from instrumentation import count, timed
+from response_cache import ResponseCache, make_cache_key
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class ApiError(Exception):
+    pass
+
+
+class QuotaExceededError(ApiError):
+    """
+    Исчерпан лимит запросов или ключ недействителен: дальнейшие запросы бесполезны.
+    """
+
+
+class RateLimitError(ApiError):
+    """
+    API ответил 429, повторные попытки не помогли.
+    """
+
+
+class TransientApiError(ApiError):
+    """
+    Временная ошибка (5xx, таймаут, обрыв соединения), повторные попытки не помогли.
+    """
+
+
+class NotFoundError(ApiError):
+    """
+    Запись не найдена (404).
+    """
+
+
+def get_retry_after(response):
+    """
+    Возвращает задержку из заголовка `Retry-After` в секундах или `None`.
+    Заголовок может содержать число секунд или HTTP дату.
+    """
+    value = response.headers.get('Retry-After')
+
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def get_backoff_delay(attempt, base, maximum):
+    """
+    Экспоненциальная задержка с полным случайным разбросом, чтобы
+    параллельные потоки не повторяли запросы одновременно.
+    """
+    return random.uniform(0, min(maximum, base * 2 ** attempt))
+
+
+def raise_for_response(response):
+    """
+    Вызывает исключение, соответствующее коду ответа API.
+    """
+    status = response.status_code
+    message = f"API Error {status}: {response.text}"
+
+    # kinopoisk.dev отвечает 403 при исчерпании суточного лимита и 401 при неверном ключе
+    if status in (401, 403):
+        raise QuotaExceededError(message)
+
+    if status == 404:
+        raise NotFoundError(message)
+
+    if status == 429:
+        raise RateLimitError(message)
+
+    if status >= 500:
+        raise TransientApiError(message)
+
+    raise ApiError(message)
+
+
+class RateLimiter:
+    """
+    Ограничитель частоты запросов по алгоритму token bucket.
+
+    Args:
+        rate (float): Количество запросов в секунду. Если `None` или 0,
+            ограничение не применяется.
+        capacity (int, optional): Максимальное количество запросов,
+            которые можно выполнить подряд без ожидания.
+    """
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate or 1))
+        self.tokens = float(self.capacity)
+        self.last_time = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Забирает токен, если он есть.
+
+        Returns:
+            float: 0, если запрос можно выполнять, иначе время ожидания в секундах.
+        """
+        if not self.rate:
+            return 0
+
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last_time) * self.rate)
+            self.last_time = now
+
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        while wait_time := self.reserve():
+            time.sleep(wait_time)
+
+    async def acquire_async(self):
+        while wait_time := self.reserve():
+            await asyncio.sleep(wait_time)
+
+
+class CachedResponse:
+    """
+    Ответ из кэша с тем же интерфейсом, что используется у `requests.Response`.
+    """
+    status_code = 200
+
+    def __init__(self, text):
+        self.text = text
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class BufferedResponse(CachedResponse):
+    """
+    Прочитанный ответ `aiohttp` с тем же интерфейсом, что у `requests.Response`.
+    """
+    def __init__(self, status_code, text, headers):
+        super().__init__(text)
+        self.status_code = status_code
+        self.headers = headers
+
+
+def create_session(api_key, pool_size=10):
+    """
+    Создает `requests.Session` с общим пулом keep-alive соединений.
+
+    Args:
+        api_key (str): Ключ API Кинопоиска.
+        pool_size (int): Максимальное количество соединений в пуле.
+
+    Returns:
+        requests.Session: Сессия с заголовком `X-API-KEY`.
+    """
+    session = requests.Session()
+    session.headers.update({"X-API-KEY": api_key})
+
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    return session
+
+
+def get_endpoint_name(path):
+    # Время запросов считается по эндпоинтам, без конкретных kp_id
+    return 'api ' + re.sub(r'/\d+', '/{id}', path)
+
+
+def get_conditional_headers(entry):
+    headers = {}
+
+    if entry and entry['etag']:
+        headers['If-None-Match'] = entry['etag']
+
+    if entry and entry['last_modified']:
+        headers['If-Modified-Since'] = entry['last_modified']
+
+    return headers
+
+
+class KinopoiskClient:
+    """
+    Клиент API Кинопоиска: общая сессия, ограничение частоты запросов
+    и дисковый кэш ответов.
+
+    Args:
+        api_key (str): Ключ API Кинопоиска.
+        api_url (str): Базовый адрес API.
+        pool_size (int): Максимальное количество соединений в пуле.
+        rate_limit (float, optional): Запросов в секунду.
+        cache (ResponseCache, optional): Кэш ответов.
+        request_limit (int, optional): Максимальное количество запросов к API,
+            ответы из кэша не учитываются. При превышении вызывается `QuotaExceededError`.
+        max_retries (int): Количество повторов при 429, 5xx и сетевых ошибках.
+        backoff_base (float): Начальная задержка перед повтором, секунд.
+        backoff_max (float): Максимальная задержка перед повтором, секунд. Если
+            `Retry-After` требует ждать дольше, повтор не выполняется.
+    """
+    def __init__(
+        self,
+        api_key,
+        api_url,
+        pool_size=10,
+        rate_limit=None,
+        cache=None,
+        request_limit=None,
+        max_retries=4,
+        backoff_base=1.0,
+        backoff_max=60.0
+    ):
+        self.api_url = api_url.rstrip('/')
+        self.session = self.open_session(api_key, pool_size)
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.cache = cache
+        self.request_limit = request_limit
+        self.request_count = 0
+        self.retry_count = 0
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.quota_exceeded = threading.Event()
+        self.lock = threading.Lock()
+
+    def open_session(self, api_key, pool_size):
+        return create_session(api_key, pool_size)
+
+    def count_request(self):
+        with self.lock:
+            if self.request_limit is not None and self.request_count >= self.request_limit:
+                raise QuotaExceededError("Исчерпан дневной лимит запросов к API")
+
+            self.request_count += 1
+
+    def start_attempt(self):
+        """
+        Учитывает очередную попытку запроса.
+
+        Raises:
+            QuotaExceededError: Лимит исчерпан, в том числе в другом потоке или задаче.
+        """
+        if self.quota_exceeded.is_set():
+            raise QuotaExceededError("Лимит запросов к API исчерпан")
+
+        try:
+            self.count_request()
+        except QuotaExceededError:
+            self.quota_exceeded.set()
+            raise
+
+    def check_response(self, response):
+        """
+        Returns:
+            ApiError | None: Ошибка, после которой запрос стоит повторить,
+                или `None` для ответа 2xx и 304.
+
+        Raises:
+            QuotaExceededError | NotFoundError | ApiError: Повтор не поможет.
+        """
+        count('api.requests')
+
+        if response.status_code < 400:
+            return None
+
+        try:
+            raise_for_response(response)
+        except QuotaExceededError:
+            self.quota_exceeded.set()
+            raise
+        except (RateLimitError, TransientApiError) as err:
+            return err
+
+    def get_retry_delay(self, attempt, error, response=None):
+        """
+        Returns:
+            float: Задержка перед следующей попыткой в секундах.
+
+        Raises:
+            ApiError: `error`, если попытки закончились или `Retry-After`
+                требует ждать дольше `backoff_max`.
+        """
+        if attempt == self.max_retries:
+            raise error
+
+        delay = get_backoff_delay(attempt, self.backoff_base, self.backoff_max)
+        retry_after = get_retry_after(response) if response is not None else None
+
+        if retry_after is not None:
+            if retry_after > self.backoff_max:
+                raise error
+
+            # Небольшой разброс, чтобы потоки не вернулись одновременно
+            delay = retry_after + delay / 10
+
+        with self.lock:
+            self.retry_count += 1
+
+        count('api.retries')
+
+        return delay
+
+    def send(self, path, params, headers, timeout):
+        """
+        Выполняет запрос с повторами при 429, 5xx и сетевых ошибках.
+
+        Returns:
+            requests.Response: Ответ 2xx или 304.
+
+        Raises:
+            QuotaExceededError: Лимит исчерпан, в том числе в другом потоке.
+            RateLimitError | TransientApiError: Повторные попытки не помогли.
+            NotFoundError | ApiError: Ошибка запроса, повтор не поможет.
+        """
+        endpoint = get_endpoint_name(path)
+
+        for attempt in range(self.max_retries + 1):
+            self.start_attempt()
+            self.rate_limiter.acquire()
+            response = None
+
+            try:
+                with timed(endpoint):
+                    response = self.session.get(f"{self.api_url}{path}", params=params, headers=headers, timeout=timeout)
+            except (requests.ConnectionError, requests.Timeout) as err:
+                error = TransientApiError(f"Ошибка соединения с API: {err}")
+            else:
+                error = self.check_response(response)
+
+                if error is None:
+                    return response
+
+            time.sleep(self.get_retry_delay(attempt, error, response))
+
+    def lookup(self, path, params):
+        """
+        Returns:
+            tuple: Ключ кэша, запись кэша и ответ из кэша, если запись свежая.
+        """
+        key = make_cache_key(path, params)
+        entry = self.cache.get(key) if self.cache else None
+
+        if entry and entry['fresh']:
+            self.cache.count('hits')
+            count('api.cache_hits')
+
+            return key, entry, CachedResponse(entry['body'])
+
+        return key, entry, None
+
+    def get(self, path, params=None, timeout=20):
+        key, entry, cached_response = self.lookup(path, params)
+
+        if cached_response is not None:
+            return cached_response
+
+        response = self.send(path, params, get_conditional_headers(entry), timeout)
+
+        return self.store(key, entry, response)
+
+    def store(self, key, entry, response):
+        if self.cache:
+            if response.status_code == 304 and entry:
+                self.cache.count('revalidated')
+                count('api.revalidated')
+                self.cache.touch(key)
+
+                return CachedResponse(entry['body'])
+
+            self.cache.count('misses')
+
+            if response.status_code == 200:
+                self.cache.set(key, response.text, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+
+        return response
+
+    def log_summary(self, logger):
+        logger.info("Запросов к API: %s, из них повторов: %s", self.request_count, self.retry_count)
+
+        if self.cache:
+            logger.info(
+                "Кэш API: попаданий %s, промахов %s, подтверждено без загрузки (304) %s",
+                self.cache.counters['hits'],
+                self.cache.counters['misses'],
+                self.cache.counters['revalidated']
+            )
+
+    def close(self):
+        self.session.close()
+
+        if self.cache:
+            self.cache.close()
+
+
+class AsyncKinopoiskClient(KinopoiskClient):
+    """
+    Асинхронный клиент API Кинопоиска на `aiohttp` с теми же кэшем,
+    лимитами и повторами, что у `KinopoiskClient`.
+
+    Количество одновременных запросов ограничивается семафором, поэтому
+    задачи можно создавать сразу для всех записей. Клиент используется
+    в одном цикле событий и закрывается через `aclose`.
+
+    Args:
+        concurrency (int): Максимальное количество одновременных запросов.
+        Остальные аргументы как у `KinopoiskClient`.
+    """
+    def __init__(self, api_key, api_url, concurrency=64, **kwargs):
+        if aiohttp is None:
+            raise ImportError("Для api_mode = 'async' установите aiohttp: pip install aiohttp")
+
+        super().__init__(api_key, api_url, pool_size=concurrency, **kwargs)
+        self.api_key = api_key
+        self.concurrency = max(1, concurrency)
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+
+    def open_session(self, api_key, pool_size):
+        # Сессия aiohttp создается внутри цикла событий при первом запросе
+        return None
+
+    async def send(self, path, params, headers, timeout):
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                headers={"X-API-KEY": self.api_key},
+                connector=aiohttp.TCPConnector(limit=self.concurrency)
+            )
+
+        endpoint = get_endpoint_name(path)
+
+        for attempt in range(self.max_retries + 1):
+            response = None
+
+            try:
+                # Ожидание повтора выполняется вне семафора и не занимает место других запросов
+                async with self.semaphore:
+                    # Лимит проверяется после ожидания семафора: за это время его могли исчерпать
+                    self.start_attempt()
+                    await self.rate_limiter.acquire_async()
+
+                    with timed(endpoint):
+                        async with self.session.get(
+                            f"{self.api_url}{path}",
+                            params=params,
+                            headers=headers,
+                            timeout=aiohttp.ClientTimeout(total=timeout)
+                        ) as raw_response:
+                            response = BufferedResponse(raw_response.status, await raw_response.text(), raw_response.headers)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+                error = TransientApiError(f"Ошибка соединения с API: {err!r}")
+            else:
+                error = self.check_response(response)
+
+                if error is None:
+                    return response
+
+            await asyncio.sleep(self.get_retry_delay(attempt, error, response))
+
+    async def get(self, path, params=None, timeout=20):
+        key, entry, cached_response = self.lookup(path, params)
+
+        if cached_response is not None:
+            return cached_response
+
+        response = await self.send(path, params, get_conditional_headers(entry), timeout)
+
+        return self.store(key, entry, response)
+
+    def close(self):
+        raise TypeError("Асинхронный клиент закрывается через await client.aclose()")
+
+    async def aclose(self):
+        if self.session is not None:
+            await self.session.close()
+
+        if self.cache:
+            self.cache.close()
+
+
+def create_client(
+    api_key,
+    api_url,
+    pool_size,
+    rate_limit,
+    cache_path=None,
+    cache_ttl=0,
+    cache_max_size_mb=0,
+    request_limit=None,
+    max_retries=4,
+    backoff_base=1.0,
+    backoff_max=60.0
+):
+    cache = ResponseCache(cache_path, cache_ttl, cache_max_size_mb) if cache_path else None
+
+    return KinopoiskClient(
+        api_key,
+        api_url,
+        pool_size=pool_size,
+        rate_limit=rate_limit,
+        cache=cache,
+        request_limit=request_limit,
+        max_retries=max_retries,
+        backoff_base=backoff_base,
+        backoff_max=backoff_max
+    )
+
+
+def create_async_client(
+    api_key,
+    api_url,
+    concurrency,
+    rate_limit,
+    cache_path=None,
+    cache_ttl=0,
+    cache_max_size_mb=0,
+    request_limit=None,
+    max_retries=4,
+    backoff_base=1.0,
+    backoff_max=60.0
+):
+    cache = ResponseCache(cache_path, cache_ttl, cache_max_size_mb) if cache_path else None
+
+    return AsyncKinopoiskClient(
+        api_key,
+        api_url,
+        concurrency=concurrency,
+        rate_limit=rate_limit,
+        cache=cache,
+        request_limit=request_limit,
+        max_retries=max_retries,
+        backoff_base=backoff_base,
+        backoff_max=backoff_max
+    )
+
+
+def get_search_params(cinematograph_title):
+    return {"query": cinematograph_title, "limit": 10, "page": 1}
+
+
+def read_search_response(response, logger):
+    if response.status_code != 200:
+        logger.error("API Error %s: %s", response.status_code, response.text)
+        raise ApiError(response.text)
+
+    return response.json().get('docs', [])
+
+
+def updating_unknown_object(cinematograph_title, client, logger):
+    try:
+        response = client.get('/v1.4/movie/search', params=get_search_params(cinematograph_title))
+
+        return read_search_response(response, logger)
+    except ApiError:
+        # Класс ошибки сохраняется: вызывающий код решает, останавливать ли запросы
+        raise
+    except Exception as err:
+        logger.error("Ошибка при поиске данных для %s: %s", cinematograph_title, err)
+
+    return []
+
+
+async def updating_unknown_object_async(cinematograph_title, client, logger):
+    try:
+        response = await client.get('/v1.4/movie/search', params=get_search_params(cinematograph_title))
+
+        return read_search_response(response, logger)
+    except ApiError:
+        raise
+    except Exception as err:
+        logger.error("Ошибка при поиске данных для %s: %s", cinematograph_title, err)
+
+    return []
\ No newline at end of file
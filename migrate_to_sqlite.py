@@ -0,0 +1,28 @@
+import config
+
+from set_logger import set_logger
+from storage import SqliteStorage, open_json_storage, migrate_json_to_sqlite
+
+
+def main():
+    try:
+        sqlite_storage = SqliteStorage(config.sqlite_path, logger)
+
+        try:
+            migrate_json_to_sqlite(open_json_storage(logger), sqlite_storage, logger)
+        finally:
+            sqlite_storage.close()
+
+        logger.info("Миграция завершена. Установите storage_backend = 'sqlite' в config.py")
+    except Exception as err:
+        logger.error("Ошибка в функции main: %s", err)
+
+
+logger = set_logger(
+    log_folder=config.log_folder,
+    log_subfolder_name='migrate_to_sqlite',
+    metrics_folder=config.metrics_folder
+)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
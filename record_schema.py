@@ -0,0 +1,94 @@
+"""
+Проекция записей Кинопоиска.
+
+В `cinematograph_data` сохраняются только поля, которые используются при
+создании заметок, сопоставлении названий и планировании обновлений.
+Эндпоинты `/v1.4/movie/{id}` и `/v1.4/movie/search` не поддерживают
+`selectFields`, поэтому лишние поля удаляются при сохранении ответа.
+"""
+
+
+# Поля, которые добавляются локально и не приходят из API
+LOCAL_FIELDS = ('date_update', 'date_image_update', 'date_not_found', 'image_pages', 'title')
+
+
+def compile_fields(fields):
+    """
+    Преобразует список полей вида `rating.kp` в дерево для `project_record`.
+
+    Args:
+        fields (list | tuple | None): Поля записи. Вложенные поля указываются
+            через точку, для списков поле применяется к каждому элементу.
+
+    Returns:
+        dict | None: Дерево полей или `None`, если запись сохраняется целиком.
+    """
+    if fields is None:
+        return None
+
+    tree = {}
+
+    for field in fields:
+        node = tree
+
+        for part in field.split('.'):
+            node = node.setdefault(part, {})
+
+    return tree
+
+
+def project_value(value, tree):
+    # Пустое поддерево означает, что значение сохраняется целиком
+    if not tree:
+        return value
+
+    if isinstance(value, dict):
+        return {key: project_value(value[key], subtree) for key, subtree in tree.items() if key in value}
+
+    if isinstance(value, list):
+        return [project_value(item, tree) for item in value]
+
+    return value
+
+
+def normalize_ids(record):
+    """
+    Приводит `id` записи и элементов `sequelsAndPrequels` к строкам, как kp_id
+    в ключах `cinematograph_data`, чтобы их можно было сравнивать напрямую.
+
+    Returns:
+        dict: Новая запись, исходная не изменяется.
+    """
+    normalized = dict(record)
+
+    if normalized.get('id') is not None:
+        normalized['id'] = str(normalized['id'])
+
+    if normalized.get('sequelsAndPrequels'):
+        normalized['sequelsAndPrequels'] = [
+            dict(item, id=str(item['id'])) if item.get('id') is not None else item
+            for item in normalized['sequelsAndPrequels']
+        ]
+
+    return normalized
+
+
+def project_record(record, tree):
+    """
+    Оставляет в записи только поля из `tree` и локальные поля `LOCAL_FIELDS`,
+    идентификаторы приводятся к строкам (`normalize_ids`).
+
+    Args:
+        record (dict): Запись Кинопоиска.
+        tree (dict | None): Дерево полей из `compile_fields`.
+
+    Returns:
+        dict: Новая запись, исходная не изменяется.
+    """
+    if tree is None:
+        return normalize_ids(record)
+
+    projected = project_value(record, tree)
+    projected.update({field: record[field] for field in LOCAL_FIELDS if field in record})
+
+    return normalize_ids(projected)
\ No newline at end of file
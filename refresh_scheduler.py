@@ -0,0 +1,154 @@
+"""
+Модуль планирования обновления устаревших записей в рамках дневного лимита запросов к API.
+"""
+import os
+
+from datetime import datetime, timedelta
+
+from utils_json import load_json, save_json
+
+
+# Статусы Кинопоиска, при которых новых сезонов уже не будет
+FINISHED_STATUSES = ('completed',)
+
+
+def get_date(data, field):
+    try:
+        return datetime.strptime(data[field], '%Y-%m-%d')
+    except (KeyError, TypeError, ValueError):
+        return datetime(1970, 1, 1)
+
+
+def get_update_date(data):
+    return get_date(data, 'date_update')
+
+
+def is_not_found_since(data, threshold):
+    """
+    Проверяет, что запись не нашлась на Кинопоиске (404) после `threshold`.
+    Такие записи повторно запрашиваются только после срока актуальности данных.
+    """
+    return get_date(data, 'date_not_found') >= threshold
+
+
+def estimate_refresh_cost(data):
+    """
+    Оценивает количество запросов на обновление записи:
+    один запрос данных и по запросу на каждую страницу кадров.
+    """
+    # Для записей, кадры которых еще не загружались, считаем одну страницу
+    return 1 + max(1, data.get('image_pages') or 1)
+
+
+def is_new_season_likely(data):
+    if not data.get('isSeries') or not data.get('seasonsInfo'):
+        return False
+
+    if data.get('status') in FINISHED_STATUSES:
+        return False
+
+    release_years = data.get('releaseYears') or []
+
+    if release_years and release_years[-1].get('end'):
+        return False
+
+    return True
+
+
+def get_refresh_priority(data, kp_id, current_ids, update_threshold_days, now):
+    """
+    Чем выше значение, тем раньше запись стоит обновить.
+
+    Учитывается, насколько запись устарела относительно `update_threshold_days`,
+    смотрит ли пользователь сериал сейчас и вероятность выхода новых сезонов.
+    """
+    staleness = (now - get_update_date(data)).days / max(1, update_threshold_days)
+    # Давно устаревшие записи не должны вытеснять просматриваемые и продолжающиеся сериалы
+    priority = min(staleness, 3)
+
+    if kp_id in current_ids:
+        priority += 5
+
+    if is_new_season_likely(data):
+        priority += 2
+
+    return priority
+
+
+def select_refresh_candidates(candidates, cinematograph_data, current_ids, update_threshold_days, budget):
+    """
+    Выбирает записи для обновления в порядке приоритета так,
+    чтобы их суммарная оценочная стоимость уложилась в `budget`.
+
+    Args:
+        candidates (list): Пары `(title, kp_id)`.
+        cinematograph_data (dict): Данные Кинопоиска по kp_id.
+        current_ids (set): kp_id просматриваемых сериалов.
+        update_threshold_days (int): Срок актуальности данных в днях.
+        budget (int | None): Доступное количество запросов, `None` — без ограничений.
+
+    Returns:
+        tuple: Выбранные и отложенные пары `(title, kp_id)`. Недавно не найденные
+            записи не попадают ни в один из списков.
+    """
+    now = datetime.now()
+    threshold = now - timedelta(days=update_threshold_days)
+    ranked = sorted(
+        [
+            (title, kp_id) for title, kp_id in candidates
+            if not is_not_found_since(cinematograph_data[kp_id], threshold)
+        ],
+        key=lambda candidate: get_refresh_priority(
+            cinematograph_data[candidate[1]],
+            candidate[1],
+            current_ids,
+            update_threshold_days,
+            now
+        ),
+        reverse=True
+    )
+
+    if budget is None:
+        return ranked, []
+
+    selected = []
+    postponed = []
+
+    for title, kp_id in ranked:
+        cost = estimate_refresh_cost(cinematograph_data[kp_id])
+
+        if cost <= budget:
+            selected.append((title, kp_id))
+            budget -= cost
+        else:
+            postponed.append((title, kp_id))
+
+    return selected, postponed
+
+
+def load_remaining_budget(state_path, daily_budget, logger):
+    """
+    Returns:
+        int | None: Остаток дневного лимита запросов, `None` — без ограничений.
+    """
+    if not daily_budget:
+        return None
+
+    state = load_json(state_path, {}, logger) if os.path.exists(state_path) else {}
+
+    if state.get('date') != datetime.now().strftime('%Y-%m-%d'):
+        return daily_budget
+
+    return max(0, daily_budget - state.get('spent', 0))
+
+
+def save_spent_requests(state_path, spent, logger):
+    today = datetime.now().strftime('%Y-%m-%d')
+    state = load_json(state_path, {}, logger) if os.path.exists(state_path) else {}
+
+    if state.get('date') != today:
+        state = {'date': today, 'spent': 0}
+
+    state['spent'] += spent
+
+    save_json(state_path, state, logger)
\ No newline at end of file
@@ -0,0 +1,48 @@
+"""
+Модуль обратного индекса сиквелов и приквелов.
+
+Индекс хранит для каждого kp_id список записей `cinematograph_data`,
+в `sequelsAndPrequels` которых он упоминается, и строится при обновлении данных.
+"""
+
+
+def build_relation_index(cinematograph_data):
+    """
+    Args:
+        cinematograph_data (dict): Данные Кинопоиска по kp_id.
+
+    Returns:
+        dict: `kp_id -> список kp_id записей, ссылающихся на него`.
+    """
+    relations = {}
+
+    for kp_id, data in cinematograph_data.items():
+        for item in data.get('sequelsAndPrequels') or []:
+            if item.get('id') is not None:
+                relations.setdefault(str(item['id']), set()).add(str(kp_id))
+
+    return {related_id: sorted(kp_ids) for related_id, kp_ids in sorted(relations.items())}
+
+
+def update_relation_index(storage, cinematograph_data, logger):
+    """
+    Перестраивает индекс и сохраняет его, если он изменился.
+
+    Returns:
+        dict: Актуальный индекс.
+    """
+    relations = build_relation_index(cinematograph_data)
+
+    if relations != storage.load('relations'):
+        storage.save('relations', relations)
+        logger.info("Индекс сиквелов и приквелов обновлен: %s записей", len(relations))
+
+    return relations
+
+
+def get_referencing_ids(relations, kp_ids):
+    """
+    Returns:
+        set: kp_id записей, в таблицах сиквелов и приквелов которых есть `kp_ids`.
+    """
+    return {referencing_id for kp_id in kp_ids for referencing_id in relations.get(str(kp_id), ())}
\ No newline at end of file
@@ -0,0 +1,113 @@
+"""
+Модуль дискового кэша ответов API.
+"""
+import time
+import sqlite3
+import threading
+
+from urllib.parse import urlencode
+
+
+def make_cache_key(path, params=None):
+    return f"{path}?{urlencode(sorted((params or {}).items()))}"
+
+
+class ResponseCache:
+    """
+    Кэш ответов API в базе SQLite с TTL и вытеснением давно не использованных
+    записей (LRU) при превышении размера.
+
+    Для устаревших записей сохраняются `ETag` и `Last-Modified`, чтобы
+    проверить их условным запросом вместо повторной загрузки.
+
+    Args:
+        db_path (str): Путь к файлу базы.
+        ttl (int): Время жизни записи в секундах.
+        max_size_mb (float): Максимальный размер тел ответов в мегабайтах.
+    """
+    def __init__(self, db_path, ttl, max_size_mb):
+        self.ttl = ttl
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'revalidated': 0}
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+
+        with self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                'key TEXT PRIMARY KEY, body TEXT, etag TEXT, last_modified TEXT, '
+                'stored_at REAL, accessed_at REAL, size INTEGER)'
+            )
+
+    def count(self, counter):
+        with self.lock:
+            self.counters[counter] += 1
+
+    def get(self, key):
+        """
+        Returns:
+            dict | None: Запись с полями `body`, `etag`, `last_modified` и `fresh`.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT body, etag, last_modified, stored_at FROM responses WHERE key = ?',
+                (key,)
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            now = time.time()
+
+            with self.connection:
+                self.connection.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+
+        body, etag, last_modified, stored_at = row
+
+        return {
+            'body': body,
+            'etag': etag,
+            'last_modified': last_modified,
+            'fresh': now - stored_at < self.ttl
+        }
+
+    def set(self, key, body, etag=None, last_modified=None):
+        now = time.time()
+
+        with self.lock, self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO responses '
+                '(key, body, etag, last_modified, stored_at, accessed_at, size) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, body, etag, last_modified, now, now, len(body))
+            )
+            self.evict()
+
+    def touch(self, key):
+        now = time.time()
+
+        with self.lock, self.connection:
+            self.connection.execute(
+                'UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?',
+                (now, now, key)
+            )
+
+    def evict(self):
+        total_size = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+        if total_size <= self.max_size:
+            return
+
+        rows = self.connection.execute('SELECT key, size FROM responses ORDER BY accessed_at').fetchall()
+        evicted_keys = []
+
+        for key, size in rows:
+            if total_size <= self.max_size:
+                break
+
+            evicted_keys.append((key,))
+            total_size -= size
+
+        self.connection.executemany('DELETE FROM responses WHERE key = ?', evicted_keys)
+
+    def close(self):
+        self.connection.close()
\ No newline at end of file
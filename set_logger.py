@@ -2,12 +2,15 @@
 Модуль для создания логгера.
 """
 import os
+import atexit
 import logging
 
 from datetime import datetime
 
+from instrumentation import log_summary
 
-def set_logger(log_folder: str = None) -> logging.Logger:
+
+def set_logger(log_folder: str = None, log_subfolder_name: str = None, metrics_folder: str = None) -> logging.Logger:
     """
     Создает и настраивает логгер для записи логов в файл и вывод в консоль.
 
@@ -17,9 +20,16 @@ def set_logger(log_folder: str = None) -> logging.Logger:
     Если указана папка `log_folder`, логи также сохраняются в файле
     с именем в формате `YYYY-MM-DD HH-MM-SS.log`.
 
+    При завершении программы в лог выводится сводка замеров времени
+    (см. модуль `instrumentation`).
+
     Args:
         log_folder (str, optional): Путь к папке для сохранения логов.
             Если `None`, логи пишутся только в консоль.
+        log_subfolder_name (str, optional): Имя подпапки в `log_folder`
+            для логов отдельного скрипта.
+        metrics_folder (str, optional): Путь к папке для сохранения сводки
+            замеров в JSON. Если `None`, сводка только выводится в лог.
 
     Returns:
         logging.Logger: Настроенный объект логгера.
@@ -29,6 +39,9 @@ def set_logger(log_folder: str = None) -> logging.Logger:
     formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
 
     if log_folder:
+        if log_subfolder_name:
+            log_folder = os.path.join(log_folder, log_subfolder_name)
+
         log_filename = datetime.now().strftime('%Y-%m-%d %H-%M-%S.log')
         log_file_path = os.path.join(log_folder, log_filename)
 
@@ -42,4 +55,10 @@ def set_logger(log_folder: str = None) -> logging.Logger:
     console_handler.setFormatter(formatter)
     logger.addHandler(console_handler)
 
+    if metrics_folder and log_subfolder_name:
+        metrics_folder = os.path.join(metrics_folder, log_subfolder_name)
+
+    # Выполняется раньше logging.shutdown, зарегистрированного при импорте logging
+    atexit.register(log_summary, logger, metrics_folder)
+
     return logger
@@ -0,0 +1,79 @@
+import json
+
+import config
+
+from set_logger import set_logger
+from storage import open_storage
+from record_schema import compile_fields, project_record
+from cinematograph_data_updater import moving_images_to_side_store
+
+
+def get_size_kb(data):
+    return len(json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')) // 1024
+
+
+def slim_cinematograph_data(storage, kinopoisk_fields, logger):
+    """
+    Удаляет из сохраненных записей поля, которых нет в `kinopoisk_fields`.
+    Кадры из старых записей предварительно переносятся в отдельное хранилище.
+
+    Args:
+        storage (JsonStorage | SqliteStorage): Хранилище.
+        kinopoisk_fields (tuple | None): Сохраняемые поля, см. `config.py`.
+        logger (logging.Logger): Логгер.
+
+    Returns:
+        int: Количество сокращенных записей.
+    """
+    fields = compile_fields(kinopoisk_fields)
+
+    if fields is None:
+        logger.info("kinopoisk_fields = None, записи сохраняются целиком")
+
+        return 0
+
+    cinematograph_data = storage.load('data')
+    size_before = get_size_kb(cinematograph_data)
+    changed = set(moving_images_to_side_store(cinematograph_data, storage))
+
+    for kp_id, data in cinematograph_data.items():
+        projected = project_record(data, fields)
+
+        if projected != data:
+            cinematograph_data[kp_id] = projected
+            changed.add(kp_id)
+
+    if changed:
+        storage.update('data', {kp_id: cinematograph_data[kp_id] for kp_id in changed})
+
+    logger.info(
+        "Сокращено записей: %s из %s, размер данных: %s КБ -> %s КБ",
+        len(changed),
+        len(cinematograph_data),
+        size_before,
+        get_size_kb(cinematograph_data)
+    )
+
+    return len(changed)
+
+
+def main():
+    try:
+        storage = open_storage(logger)
+
+        try:
+            slim_cinematograph_data(storage, config.kinopoisk_fields, logger)
+        finally:
+            storage.close()
+    except Exception as err:
+        logger.error("Ошибка в функции main: %s", err)
+
+
+logger = set_logger(
+    log_folder=config.log_folder,
+    log_subfolder_name='slim_cinematograph_data',
+    metrics_folder=config.metrics_folder
+)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,253 @@
+"""
+Модуль хранилищ данных: JSON файлы или база SQLite.
+
+Хранилища:
+    data - данные Кинопоиска по kp_id (`cinematograph_data.json`)
+    experience - история просмотров по названию (`cinematograph.json`)
+    current - просматриваемые сериалы по названию (`current_cinematograph.json`)
+    exceptions - список kp_id исключений (`cinematograph_exceptions.json`)
+    images - кадры по kp_id, загружаются только по запросу (папка `cinematograph_images`)
+    relations - обратный индекс сиквелов и приквелов (`cinematograph_relations.json`)
+"""
+import os
+import json
+import sqlite3
+
+import config
+
+from utils_json import load_json, save_json
+from instrumentation import timed
+
+
+STORE_NAMES = ('data', 'experience', 'current', 'exceptions', 'images', 'relations')
+LIST_STORES = ('exceptions',)
+
+
+def get_default(name):
+    return [] if name in LIST_STORES else {}
+
+
+class JsonStorage:
+    """
+    Хранилище в JSON файлах.
+
+    Загруженные данные кэшируются: `load` возвращает один и тот же объект,
+    изменения которого сохраняются вызовом `save`.
+
+    Хранилища из `directories` хранятся по файлу на ключ и не кэшируются,
+    чтобы не загружать их целиком.
+    """
+    def __init__(self, paths, logger, compact_names=(), directories=None):
+        self.paths = paths
+        self.logger = logger
+        self.compact_names = set(compact_names)
+        self.directories = directories or {}
+        self.cache = {}
+
+    def get_key_path(self, name, key):
+        return os.path.join(self.directories[name], f"{key}.json")
+
+    def load(self, name):
+        if name in self.directories:
+            directory = self.directories[name]
+
+            if not os.path.isdir(directory):
+                return {}
+
+            return {
+                file_name[:-len('.json')]: load_json(os.path.join(directory, file_name), None, self.logger)
+                for file_name in sorted(os.listdir(directory))
+                if file_name.endswith('.json')
+            }
+
+        if name not in self.cache:
+            path = self.paths[name]
+            self.cache[name] = load_json(path, get_default(name), self.logger) if os.path.exists(path) else get_default(name)
+
+        return self.cache[name]
+
+    def save(self, name, data):
+        if name in self.directories:
+            for key in set(self.load(name)) - set(str(key) for key in data):
+                os.remove(self.get_key_path(name, key))
+
+            self.update(name, data)
+
+            return
+
+        self.cache[name] = data
+        save_json(self.paths[name], data, self.logger, compact=name in self.compact_names)
+
+    def get(self, name, key, default=None):
+        if name in self.directories:
+            path = self.get_key_path(name, key)
+
+            return load_json(path, default, self.logger) if os.path.exists(path) else default
+
+        data = self.load(name)
+
+        if name in LIST_STORES:
+            return key if key in data else default
+
+        return data.get(key, default)
+
+    def upsert(self, name, key, value=None):
+        self.update(name, {key: value})
+
+    def update(self, name, items):
+        if name in self.directories:
+            os.makedirs(self.directories[name], exist_ok=True)
+
+            for key, value in items.items():
+                save_json(self.get_key_path(name, key), value, self.logger, compact=name in self.compact_names)
+
+            return
+
+        data = self.load(name)
+
+        if name in LIST_STORES:
+            data.extend(key for key in items if key not in data)
+        else:
+            data.update(items)
+
+        self.save(name, data)
+
+    def delete(self, name, key):
+        if name in self.directories:
+            path = self.get_key_path(name, key)
+
+            if os.path.exists(path):
+                os.remove(path)
+
+            return
+
+        data = self.load(name)
+
+        if name in LIST_STORES:
+            data[:] = [item for item in data if item != key]
+        else:
+            data.pop(key, None)
+
+        self.save(name, data)
+
+    def close(self):
+        pass
+
+
+class SqliteStorage:
+    """
+    Хранилище в базе SQLite: одна таблица `key -> JSON` на каждое хранилище.
+
+    Поддерживает чтение и запись отдельных записей без загрузки всей базы.
+    Порядок записей сохраняется по `rowid`.
+    """
+    tables = {
+        'data': 'cinematograph_data',
+        'experience': 'cinematograph_experience',
+        'current': 'current_cinematograph',
+        'exceptions': 'cinematograph_exceptions',
+        'images': 'cinematograph_images',
+        'relations': 'cinematograph_relations'
+    }
+
+    def __init__(self, db_path, logger):
+        self.logger = logger
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+
+        with self.connection:
+            for table in self.tables.values():
+                self.connection.execute(
+                    f'CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT)'
+                )
+
+    @timed('sqlite.load')
+    def load(self, name):
+        rows = self.connection.execute(f'SELECT key, value FROM {self.tables[name]} ORDER BY rowid')
+
+        if name in LIST_STORES:
+            return [key for key, _ in rows]
+
+        return {key: json.loads(value) for key, value in rows}
+
+    def save(self, name, data):
+        with self.connection:
+            self.connection.execute(f'DELETE FROM {self.tables[name]}')
+            self.write_rows(name, data if name in LIST_STORES else data.items())
+
+    def get(self, name, key, default=None):
+        row = self.connection.execute(
+            f'SELECT key, value FROM {self.tables[name]} WHERE key = ?',
+            (str(key),)
+        ).fetchone()
+
+        if row is None:
+            return default
+
+        return row[0] if name in LIST_STORES else json.loads(row[1])
+
+    def upsert(self, name, key, value=None):
+        self.update(name, {key: value})
+
+    def update(self, name, items):
+        with self.connection:
+            self.write_rows(name, items if name in LIST_STORES else items.items())
+
+    def delete(self, name, key):
+        with self.connection:
+            self.connection.execute(f'DELETE FROM {self.tables[name]} WHERE key = ?', (str(key),))
+
+    @timed('sqlite.write')
+    def write_rows(self, name, items):
+        if name in LIST_STORES:
+            rows = ((str(key), None) for key in items)
+        else:
+            rows = ((str(key), json.dumps(value, ensure_ascii=False)) for key, value in items)
+
+        # ON CONFLICT ... DO UPDATE сохраняет rowid, а значит и порядок записей
+        self.connection.executemany(
+            f'INSERT INTO {self.tables[name]} (key, value) VALUES (?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET value = excluded.value',
+            rows
+        )
+
+    def close(self):
+        self.connection.close()
+
+
+def open_json_storage(logger):
+    return JsonStorage(
+        paths={
+            'data': config.json_data_path,
+            'experience': config.json_experience_path,
+            'current': config.json_current_path,
+            'exceptions': config.json_exceptions_path,
+            'relations': config.json_relations_path
+        },
+        logger=logger,
+        compact_names=('data', 'images', 'relations') if config.json_data_compact else (),
+        directories={'images': config.json_images_folder}
+    )
+
+
+def open_storage(logger):
+    """
+    Открывает хранилище, выбранное в `config.storage_backend`.
+
+    Args:
+        logger (logging.Logger): Логгер.
+
+    Returns:
+        JsonStorage | SqliteStorage: Хранилище данных.
+    """
+    if config.storage_backend == 'sqlite':
+        return SqliteStorage(config.sqlite_path, logger)
+
+    return open_json_storage(logger)
+
+
+def migrate_json_to_sqlite(json_storage, sqlite_storage, logger):
+    for name in STORE_NAMES:
+        data = json_storage.load(name)
+        sqlite_storage.save(name, data)
+        logger.info("Перенесено в SQLite (%s): %s записей", name, len(data))
@@ -0,0 +1,366 @@
+"""
+Модуль пакетного сопоставления названий с записями Кинопоиска.
+
+Поиск по всем названиям выполняется параллельно. Уверенные совпадения
+принимаются автоматически, остальные варианты показываются пользователю
+сразу для всех названий: в терминале или на локальной HTML странице.
+"""
+import re
+import html
+import asyncio
+import threading
+import webbrowser
+
+from urllib.parse import parse_qs
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from difflib import SequenceMatcher
+from concurrent.futures import ThreadPoolExecutor
+
+from kinopoisk_api import ApiError, QuotaExceededError, updating_unknown_object, updating_unknown_object_async
+
+
+def search_candidates(titles, client, concurrency, logger):
+    """
+    Параллельно ищет варианты для каждого названия через API.
+
+    При исчерпании лимита (`QuotaExceededError`) новые запросы не отправляются.
+    Названия с другими ошибками API пропускаются и ищутся при следующем запуске.
+
+    Args:
+        titles (list): Названия для поиска.
+        client (KinopoiskClient): Клиент API.
+        concurrency (int): Количество одновременных запросов.
+        logger (logging.Logger): Логгер.
+
+    Returns:
+        tuple: Словарь `title -> список вариантов` для названий, по которым
+            поиск выполнен, и `False`, если API стал недоступен.
+    """
+    api_stop = threading.Event()
+
+    def search(title):
+        if api_stop.is_set():
+            return None
+
+        try:
+            return updating_unknown_object(title, client, logger)
+        except QuotaExceededError:
+            api_stop.set()
+        except ApiError as err:
+            logger.error("Ошибка при поиске данных для %s: %s", title, err)
+
+        return None
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        results = list(executor.map(search, titles))
+
+    candidates = {title: docs for title, docs in zip(titles, results) if docs is not None}
+
+    return candidates, not api_stop.is_set()
+
+
+async def search_candidates_async(titles, client, logger):
+    """
+    Асинхронный вариант `search_candidates`. Количество одновременных
+    запросов ограничивает `AsyncKinopoiskClient`.
+
+    Args:
+        titles (list): Названия для поиска.
+        client (AsyncKinopoiskClient): Асинхронный клиент API.
+        logger (logging.Logger): Логгер.
+
+    Returns:
+        tuple: Как у `search_candidates`.
+    """
+    api_stop = threading.Event()
+
+    async def search(title):
+        if api_stop.is_set():
+            return None
+
+        try:
+            return await updating_unknown_object_async(title, client, logger)
+        except QuotaExceededError:
+            api_stop.set()
+        except ApiError as err:
+            logger.error("Ошибка при поиске данных для %s: %s", title, err)
+
+        return None
+
+    results = await asyncio.gather(*(search(title) for title in titles))
+    candidates = {title: docs for title, docs in zip(titles, results) if docs is not None}
+
+    return candidates, not api_stop.is_set()
+
+
+def normalize_name(name):
+    name = name.lower().replace('ё', 'е')
+    name = re.sub(r'[^\w\s]', ' ', name)
+
+    return ' '.join(name.split())
+
+
+def get_title_hints(title, experience_data=None, is_series=None):
+    """
+    Извлекает из введенных пользователем данных признаки для сравнения с вариантами.
+
+    Args:
+        title (str): Название, может содержать год выхода в скобках: `Дюна (2021)`.
+        experience_data (dict, optional): Запись истории просмотров.
+        is_series (bool, optional): Тип, если он известен заранее.
+
+    Returns:
+        dict: Название без года, год выхода, год первого просмотра и тип.
+    """
+    match = re.search(r'\s*\((\d{4})\)\s*$', title)
+    experience = (experience_data or {}).get('experience') or []
+    dates = [item['date'] for item in experience if item.get('date')]
+
+    if is_series is None and experience:
+        # Для сериалов пользователь вводит номер сезона
+        is_series = any('season' in item for item in experience)
+
+    return {
+        'name': title[:match.start()] if match else title,
+        'year': int(match.group(1)) if match else None,
+        'watched_year': int(min(dates)[:4]) if dates else None,
+        'is_series': is_series
+    }
+
+
+def score_candidate(hints, candidate):
+    """
+    Оценивает соответствие варианта названию от 0 до 1.
+
+    Учитывается сходство названия с `name`, `alternativeName` и `enName`,
+    близость года выхода и совпадение типа фильм/сериал.
+    """
+    name = normalize_name(hints['name'])
+    candidate_names = [candidate.get('name'), candidate.get('alternativeName'), candidate.get('enName')]
+    candidate_names += [item.get('name') for item in candidate.get('names') or []]
+    name_score = max(
+        (
+            SequenceMatcher(None, name, normalize_name(candidate_name)).ratio()
+            for candidate_name in candidate_names
+            if candidate_name
+        ),
+        default=0
+    )
+
+    year = candidate.get('year')
+
+    if not year:
+        year_score = 0.5
+    elif hints['year']:
+        year_score = 1 - min(abs(year - hints['year']), 5) / 5
+    elif hints['watched_year']:
+        # Нельзя посмотреть то, что вышло позже первого просмотра
+        year_score = 1 if year <= hints['watched_year'] else 0
+    else:
+        year_score = 0.5
+
+    if hints['is_series'] is None or candidate.get('isSeries') is None:
+        type_score = 0.5
+    else:
+        type_score = 1 if candidate['isSeries'] == hints['is_series'] else 0
+
+    return 0.6 * name_score + 0.2 * year_score + 0.2 * type_score
+
+
+def resolve_candidates(candidates, hints, threshold, margin):
+    """
+    Автоматически принимает варианты, уверенно совпадающие с названием.
+
+    Вариант принимается, если его оценка не ниже `threshold` и превосходит
+    оценку следующего варианта не меньше чем на `margin`.
+
+    Args:
+        candidates (dict): Варианты `title -> список записей Кинопоиска`.
+        hints (dict): Признаки названий `title -> get_title_hints(...)`.
+        threshold (float): Минимальная оценка для автоматического выбора.
+        margin (float): Минимальный отрыв от следующего варианта.
+
+    Returns:
+        tuple: Принятые варианты `title -> запись Кинопоиска` и
+            оставшиеся для ручного выбора `title -> список записей`,
+            отсортированных по убыванию оценки.
+    """
+    accepted = {}
+    ambiguous = {}
+
+    for title, docs in candidates.items():
+        scored = sorted(
+            ((score_candidate(hints[title], doc), doc) for doc in docs),
+            key=lambda item: item[0],
+            reverse=True
+        )
+
+        if not scored:
+            continue
+
+        best_score = scored[0][0]
+        next_score = scored[1][0] if len(scored) > 1 else 0
+
+        if best_score >= threshold and best_score - next_score >= margin:
+            accepted[title] = scored[0][1]
+        else:
+            ambiguous[title] = [doc for _, doc in scored]
+
+    return accepted, ambiguous
+
+
+def describe_candidate(candidate):
+    name = candidate.get('name') or candidate.get('alternativeName') or '—'
+    alternative_name = candidate.get('alternativeName')
+    cinematograph_type = 'сериал' if candidate.get('isSeries') else 'фильм'
+    poster = (candidate.get('poster') or {}).get('previewUrl') or (candidate.get('poster') or {}).get('url')
+
+    description = name
+
+    if alternative_name and alternative_name != name:
+        description += f" / {alternative_name}"
+
+    description += f", {candidate.get('year') or '—'}, {cinematograph_type}"
+    description += f", https://www.kinopoisk.ru/film/{candidate.get('id')}"
+
+    if poster:
+        description += f", постер: {poster}"
+
+    return description
+
+
+def pick_in_terminal(candidates):
+    """
+    Показывает в терминале варианты для всех названий,
+    затем запрашивает выбор по каждому названию.
+
+    Returns:
+        dict: Выбранные варианты `title -> запись Кинопоиска`.
+    """
+    titles = [title for title, docs in candidates.items() if docs]
+
+    for number, title in enumerate(titles, start=1):
+        print(f"\n[{number}/{len(titles)}] {title}")
+
+        for index, candidate in enumerate(candidates[title], start=1):
+            print(f"    {index}. {describe_candidate(candidate)}")
+
+    choices = {}
+    print()
+
+    for number, title in enumerate(titles, start=1):
+        docs = candidates[title]
+
+        while True:
+            answer = input(f"[{number}/{len(titles)}] {title} — номер варианта (Enter — пропустить): ").strip()
+
+            if not answer:
+                break
+
+            if answer.isdigit() and 1 <= int(answer) <= len(docs):
+                choices[title] = docs[int(answer) - 1]
+                break
+
+            print(f"Введите число от 1 до {len(docs)}")
+
+    return choices
+
+
+def build_picker_page(titles, candidates):
+    rows = []
+
+    for title_index, title in enumerate(titles):
+        options = [
+            f'<label><input type="radio" name="{title_index}" value="" checked> Пропустить</label>'
+        ]
+
+        for index, candidate in enumerate(candidates[title]):
+            poster = (candidate.get('poster') or {}).get('previewUrl')
+            image = f'<img src="{html.escape(poster)}" height="120"> ' if poster else ''
+            options.append(
+                f'<label><input type="radio" name="{title_index}" value="{index}"> '
+                f'{image}{html.escape(describe_candidate(candidate))}</label>'
+            )
+
+        rows.append(f'<fieldset><legend>{html.escape(title)}</legend>{"<br>".join(options)}</fieldset>')
+
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>Сопоставление названий</title></head>'
+        f'<body><form method="post">{"".join(rows)}<button type="submit">Сохранить</button></form></body></html>'
+    )
+
+
+def pick_in_browser(candidates, logger):
+    """
+    Показывает варианты для всех названий на локальной HTML странице
+    и ждет отправки формы.
+
+    Returns:
+        dict: Выбранные варианты `title -> запись Кинопоиска`.
+    """
+    titles = [title for title, docs in candidates.items() if docs]
+    page = build_picker_page(titles, candidates).encode('utf-8')
+    choices = {}
+    submitted = threading.Event()
+
+    class PickerHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def send_page(self, body):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            self.send_page(page)
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            form = parse_qs(self.rfile.read(length).decode('utf-8'))
+
+            for title_index, title in enumerate(titles):
+                value = form.get(str(title_index), [''])[0]
+
+                if value.isdigit():
+                    choices[title] = candidates[title][int(value)]
+
+            self.send_page('Выбор сохранен, страницу можно закрыть.'.encode('utf-8'))
+            submitted.set()
+
+    server = HTTPServer(('127.0.0.1', 0), PickerHandler)
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    try:
+        logger.info("Выберите варианты на странице %s", url)
+        webbrowser.open(url)
+
+        while not submitted.is_set():
+            server.handle_request()
+    finally:
+        server.server_close()
+
+    return choices
+
+
+def choose_candidates(candidates, picker, logger):
+    """
+    Предлагает пользователю выбрать подходящие варианты для всех названий за один проход.
+
+    Args:
+        candidates (dict): Варианты `title -> список записей Кинопоиска`.
+        picker (str): `"terminal"` или `"html"`.
+        logger (logging.Logger): Логгер.
+
+    Returns:
+        dict: Выбранные варианты `title -> запись Кинопоиска`.
+    """
+    if not any(candidates.values()):
+        return {}
+
+    if picker == 'html':
+        return pick_in_browser(candidates, logger)
+
+    return pick_in_terminal(candidates)
\ No newline at end of file
@@ -1,24 +1,90 @@
 import os
 import json
+import shutil
+import tempfile
 
+from instrumentation import timed
 
-def save_json(file_path, data, logger):
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# umask можно узнать только заменив его, поэтому читаем один раз при импорте, а не из потоков
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+def dump_json(data, file, compact, backend=None):
+    backend = backend or orjson or json
+
+    if compact and backend is not json:
+        file.write(backend.dumps(data, option=backend.OPT_NON_STR_KEYS))
+    elif compact:
+        file.write(json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    else:
+        file.write(json.dumps(data, ensure_ascii=False, indent=4).encode('utf-8'))
+
+
+def save_json(file_path, data, logger, compact=False, backend=None):
+    """
+    Атомарно сохраняет данные в JSON файл.
+
+    Данные записываются во временный файл в той же папке, который затем
+    заменяет целевой, поэтому при сбое старый файл остается целым.
+
+    Args:
+        file_path (str): Путь к файлу.
+        data: Сохраняемые данные.
+        logger (logging.Logger): Логгер.
+        compact (bool): Сохранять без отступов. Если установлен `orjson`,
+            используется он, иначе стандартный `json`.
+        backend (module, optional): Модуль `json` или `orjson` вместо выбранного
+            при импорте, например для сравнения в бенчмарках.
+    """
     try:
         file_path = os.path.normpath(file_path)
+        directory = os.path.dirname(file_path) or '.'
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f"{os.path.basename(file_path)}.", suffix='.tmp')
+
+        try:
+            with timed('json.save'):
+                with os.fdopen(fd, 'wb') as file:
+                    dump_json(data, file, compact, backend)
+                    file.flush()
+                    os.fsync(file.fileno())
+
+                # mkstemp создает файл с правами 0600, новый файл получает права по umask, как при open()
+                if os.path.exists(file_path):
+                    shutil.copymode(file_path, temp_path)
+                else:
+                    os.chmod(temp_path, 0o666 & ~UMASK)
+
+                os.replace(temp_path, file_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
 
-        with open(file_path, 'w', encoding='utf-8') as file:
-            json.dump(data, file, ensure_ascii=False, indent=4)
+            raise
     except Exception as err:
         logger.error("Ошибка при сохранении файла %s: %s", file_path, err)
 
 
-def load_json(file_path, default_type, logger):
+def load_json(file_path, default_type, logger, backend=None):
+    backend = backend or orjson or json
+
     try:
         file_path = os.path.normpath(file_path)
 
         if os.path.exists(file_path):
-            with open(file_path, 'r', encoding='utf-8') as file:
-                return json.load(file)
+            with timed('json.load'):
+                with open(file_path, 'rb') as file:
+                    content = file.read()
+
+                if backend is json:
+                    return json.loads(content.decode('utf-8'))
+
+                return backend.loads(content)
         else:
             logger.warning("Файл %s не найден, возвращаем значение по умолчанию.", file_path)
     except Exception as err: